@@ -1,15 +1,33 @@
 import pygame
 import random
 import math
-
-# Initialize Pygame
-pygame.init()
+import os
+import sys
+import gc
+import csv
+import time
+import struct
+import threading
+import hashlib
+import json
+import argparse
+from collections import OrderedDict, deque
+from itertools import islice
+
+import numpy as np
 
 # Constants
 SCREEN_WIDTH = 1000
 SCREEN_HEIGHT = 600
 FPS = 60
 
+# The simulation always advances in fixed ticks, whatever the render rate
+TICK_RATE = 60
+# At most this many ticks per rendered frame; any further backlog is dropped
+MAX_CATCH_UP = 5
+# Longer frames (window drags, breakpoints) are clamped to this, in seconds
+MAX_FRAME_TIME = 0.25
+
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -26,147 +44,558 @@ LIGHT_BLUE = (173, 216, 230)
 DARK_BLUE = (25, 25, 112)
 GOLD = (255, 215, 0)
 
-# Initialize screen
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Telesheepy vs Rocket Hair")
-clock = pygame.time.Clock()
-
 # Ground level
 GROUND = SCREEN_HEIGHT - 100
 
+# Balance (module level so batch runs can override them)
+LIGHTNING_DAMAGE = 15
+ENHANCED_LIGHTNING_DAMAGE = 25
+HYPERCHARGE_LIGHTNING_DAMAGE = 30
+ROCKET_DAMAGE = 18
+HOMING_DAMAGE = 25
+HYPERCHARGE_DURATION = 180  # 3 seconds at 60 ticks per second
+HYPERCHARGE_COOLDOWN = 900  # 15 seconds
+PROJECTILE_CLASH = 1  # lightning and rockets destroy each other on contact
+# A health pickup drops every PICKUP_INTERVAL ticks (0 for none) and vanishes
+# after PICKUP_LIFETIME ticks unless a fighter reaches it first
+PICKUP_INTERVAL = 900
+PICKUP_LIFETIME = 300
+PICKUP_HEAL = 20
+PICKUP_SIZE = 24
+
+# Projectile pool sizes per fighter
+LIGHTNING_CAPACITY = 128
+ROCKET_CAPACITY = 64
+# Smoke puffs kept behind each rocket
+ROCKET_TRAIL_LENGTH = 10
+
+# Ability definitions per character, compiled by load_abilities
+ABILITIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'abilities.json')
+
+# Key bindings
+P1_CONTROLS = {
+    'left': pygame.K_a,
+    'right': pygame.K_d,
+    'up': pygame.K_w,
+    'down': pygame.K_s,
+    'abilities': (pygame.K_1, pygame.K_2, pygame.K_3),
+    'hypercharge': pygame.K_4
+}
+P2_CONTROLS = {
+    'left': pygame.K_j,
+    'right': pygame.K_l,
+    'up': pygame.K_i,
+    'down': pygame.K_k,
+    'abilities': (pygame.K_7, pygame.K_8, pygame.K_9),
+    'hypercharge': pygame.K_0
+}
+# Only two fighters can share the keyboard; the rest reuse these layouts under bot control
+FIGHTER_CONTROLS = (P1_CONTROLS, P2_CONTROLS)
+
+# Fighters per match, and the classic one-on-one roster
+MAX_FIGHTERS = 8
+DEFAULT_ROSTER = ('Telesheepy', 'RocketHair')
+
+
+class ParticleSystem:
+    """Fixed-capacity pool of visual particles stored as parallel NumPy arrays.
+
+    Particles are spawned in bursts, integrated and expired in one batched
+    step, and drawn with a single ``blits`` call from cached dot sprites.
+    """
+    def __init__(self, capacity=1024, seed=None):
+        self.capacity = capacity
+        self.count = 0
+        self.enabled = True
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.life = np.zeros(capacity, dtype=np.int32)
+        self.max_life = np.ones(capacity, dtype=np.int32)
+        self.size = np.zeros(capacity, dtype=np.int32)
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+        self.rng = np.random.default_rng(seed)
+
+    def emit(self, count, x, y, color, vel_x=(-2, 2), vel_y=(-2, 2), life=30,
+             spread_x=(0, 0), spread_y=(0, 0)):
+        """Spawn up to ``count`` particles around (x, y).
+
+        ``color`` is either one RGB tuple or a list of them to pick from at
+        random. Velocities and position spreads are (low, high) ranges.
+        Particles that do not fit in the pool are dropped.
+        """
+        if not self.enabled:
+            return
+        scale = quality.particles
+        if scale < 1:
+            # Round randomly so small bursts thin out instead of vanishing
+            scaled = count * scale
+            count = int(scaled) + (self.rng.random() < scaled - int(scaled))
+        start = self.count
+        count = min(count, self.capacity - start)
+        if count <= 0:
+            return
+        end = start + count
+        rng = self.rng
+
+        self.pos[start:end, 0] = x + rng.uniform(spread_x[0], spread_x[1], count)
+        self.pos[start:end, 1] = y + rng.uniform(spread_y[0], spread_y[1], count)
+        self.vel[start:end, 0] = rng.uniform(vel_x[0], vel_x[1], count)
+        self.vel[start:end, 1] = rng.uniform(vel_y[0], vel_y[1], count)
+        self.life[start:end] = life
+        self.max_life[start:end] = life
+        self.size[start:end] = rng.integers(2, 6, count)
+
+        palette = np.asarray(color, dtype=np.uint8).reshape(-1, 3)
+        if len(palette) == 1:
+            self.color[start:end] = palette[0]
+        else:
+            self.color[start:end] = palette[rng.integers(0, len(palette), count)]
+        self.count = end
 
-class Particle:
-    """Visual effect particle"""
-    def __init__(self, x, y, color, vel_x=None, vel_y=None, life=30):
-        self.x = x
-        self.y = y
-        self.color = color
-        self.vel_x = vel_x if vel_x is not None else random.uniform(-2, 2)
-        self.vel_y = vel_y if vel_y is not None else random.uniform(-2, 2)
-        self.life = life
-        self.max_life = life
-        self.size = random.randint(2, 5)
-        
     def update(self):
-        self.x += self.vel_x
-        self.y += self.vel_y
-        self.vel_y += 0.2  # Gravity
-        self.life -= 1
-        
+        n = self.count
+        if n == 0:
+            return
+        self.pos[:n] += self.vel[:n]
+        self.vel[:n, 1] += 0.2  # Gravity
+        self.life[:n] -= 1
+
+        # Compact the survivors to the front of the pool
+        alive = self.life[:n] > 0
+        if not alive.all():
+            keep = np.flatnonzero(alive)
+            k = len(keep)
+            for arr in (self.pos, self.vel, self.life, self.max_life, self.size, self.color):
+                arr[:k] = arr[keep]
+            self.count = k
+
+    def clear(self):
+        self.count = 0
+
+    def copy_from(self, other):
+        """Replace the live particles with those of ``other``, a pool at least as small."""
+        n = self.count = other.count
+        for name in ('pos', 'vel', 'life', 'max_life', 'size', 'color'):
+            getattr(self, name)[:n] = getattr(other, name)[:n]
+
     def draw(self, screen):
-        if self.life > 0 and self.max_life > 0:
-            alpha = int((self.life / self.max_life) * 255)
-            size = max(1, int(self.size * (self.life / self.max_life)))
-            pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), size)
+        """Draw every live particle and return the Rect bounding them, or None."""
+        n = self.count
+        if n == 0:
+            return None
+        sizes = np.maximum(1, (self.size[:n] * self.life[:n] // self.max_life[:n]))
+        corners = self.pos[:n].astype(np.int32) - sizes[:, None]
+        screen.blits([(_dot_sprite(tuple(color), size), pos)
+                      for color, size, pos in zip(self.color[:n].tolist(), sizes.tolist(), corners.tolist())],
+                     doreturn=False)
+        left, top = corners.min(axis=0).tolist()
+        right, bottom = (corners + sizes[:, None] * 2 + 1).max(axis=0).tolist()
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def __len__(self):
+        return self.count
+
+
+_dot_sprites = {}
+
+
+def _dot_sprite(color, radius):
+    """Return a cached filled circle Surface for particle drawing."""
+    key = (color, radius)
+    sprite = _dot_sprites.get(key)
+    if sprite is None:
+        sprite = pygame.Surface((radius * 2 + 1, radius * 2 + 1), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, color, (radius, radius), radius)
+        _dot_sprites[key] = sprite
+    return sprite
+
+
+def tint(color, offset):
+    return tuple(max(0, min(255, c + o)) for c, o in zip(color, offset))
+
+
+class SpriteCache:
+    """Character art rendered once per (class, facing, tint, aura).
+
+    Characters describe their art in ``draw_body``; the cache bakes it into a
+    Surface the first time a combination is seen, so drawing a fighter is a
+    single blit. The random hypercharge glow is approximated by a fixed set
+    of pre-baked tint variants.
+    """
+    PAD_X = 10
+    PAD_Y = 30
+    SIZE = (70, 120)
+    GLOW_VARIANTS = 8
+
+    def __init__(self):
+        self.sprites = {}
+
+    def draw(self, screen, character, alpha=1.0):
+        key = (type(character), character.direction > 0, character.tint_key(), character.hypercharge_active)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = self.bake(character, key)
+        x = character.prev_x + (character.x - character.prev_x) * alpha
+        y = character.prev_y + (character.y - character.prev_y) * alpha
+        return screen.blit(sprite, (int(x) - self.PAD_X, int(y) - self.PAD_Y))
+
+    def bake(self, character, key):
+        _, facing_right, tint_key, aura = key
+        if tint_key == 'hit':
+            color_offset = (50, 50, 50)
+        elif tint_key is None:
+            color_offset = (0, 0, 0)
+        else:
+            color_offset = character.glow_tint(random.Random(tint_key))
+        sprite = pygame.Surface(self.SIZE, pygame.SRCALPHA)
+        character.draw_body(sprite, self.PAD_X, self.PAD_Y, color_offset, 1 if facing_right else -1, aura)
+        self.sprites[key] = sprite
+        return sprite
+
+
+sprite_cache = SpriteCache()
+
+
+class Projectile:
+    """Base for pooled projectile records.
+
+    Subclasses list their fields in ``__slots__`` and reset them in
+    ``activate`` so a ProjectilePool can reuse records without allocating.
+    For Match snapshots they pack the fields gameplay depends on into
+    ``STATE`` and the purely cosmetic rest (drawn from ``fx_rng``) separately.
+    """
+    __slots__ = ()
+    STATE = None
+    # Damage attribution names, stored in snapshots by index
+    abilities = ()
+    # Whether it steers toward its target after launch
+    homing = False
+
+    def pack_state(self):
+        raise NotImplementedError
+
+    def unpack_state(self, buffer, offset):
+        raise NotImplementedError
+
+    def pack_cosmetic(self):
+        return b""
+
+    def unpack_cosmetic(self, buffer, offset):
+        return offset
+
+
+class ProjectilePool:
+    """Fixed-capacity pool of projectile records.
+
+    Live projectiles are ``items[:count]``. ``spawn`` reactivates the first
+    spare record in place and ``compact`` swap-removes inactive ones, so
+    firing abilities allocates nothing. When the pool is full, ``spawn``
+    returns a scratch record that is never updated or drawn. Extra ``args``
+    are passed to every record's constructor.
+    """
+    def __init__(self, cls, capacity, *args):
+        self.cls = cls
+        self.items = [cls(*args) for _ in range(capacity)]
+        self.count = 0
+        self.overflow = cls(*args)
+
+    def acquire(self):
+        """Return the next spare record as it is, for the caller to fill in."""
+        if self.count == len(self.items):
+            return self.overflow
+        item = self.items[self.count]
+        self.count += 1
+        return item
+
+    def spawn(self, *args):
+        item = self.acquire()
+        item.activate(*args)
+        return item
+
+    def compact(self):
+        items = self.items
+        i = 0
+        n = self.count
+        while i < n:
+            if items[i].active:
+                i += 1
+            else:
+                n -= 1
+                items[i], items[n] = items[n], items[i]
+        self.count = n
 
+    def clear(self):
+        self.count = 0
 
-class Lightning:
-    def __init__(self, x, y, direction, enhanced=False):
-        self.x = x
-        self.y = y
-        self.direction = direction
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return islice(self.items, self.count)
+
+
+class Lightning(Projectile):
+    __slots__ = ('x', 'y', 'prev_x', 'prev_y', 'direction', 'width', 'height', 'damage', 'speed', 'active',
+                 'animation_frame', 'enhanced', 'ability', 'angle', 'branch_offsets',
+                 'branch_lengths', 'fx_rng')
+    # x, y, prev_x, prev_y, damage, speed, direction, active, enhanced, ability, angle, animation_frame
+    STATE = struct.Struct('<6db??BhI')
+    COSMETIC = struct.Struct('<3b3B')
+    abilities = ('lightning', 'storm', 'wave', 'hypercharge')
+
+    def __init__(self, x=0, y=0, direction=1, enhanced=False, fx_rng=None):
         self.width = 30
         self.height = 80
-        self.damage = 15 if not enhanced else 25
+        self.branch_offsets = [0, 0, 0]
+        self.branch_lengths = [0, 0, 0]
+        self.activate(x, y, direction, enhanced, fx_rng)
+
+    def activate(self, x, y, direction, enhanced=False, fx_rng=None):
+        self.x = self.prev_x = x
+        self.y = self.prev_y = y
+        self.direction = direction
+        self.damage = LIGHTNING_DAMAGE if not enhanced else ENHANCED_LIGHTNING_DAMAGE
         self.speed = 12 if not enhanced else 15
         self.active = True
         self.animation_frame = 0
         self.enhanced = enhanced
-        self.particles = []
-        self.branches = []
+        self.ability = 'lightning'
+        self.angle = 0
+        self.fx_rng = fx_rng if fx_rng is not None else random
         
         # Create lightning branches
         if enhanced:
-            for _ in range(3):
-                branch_offset = random.randint(-20, 20)
-                self.branches.append({
-                    'offset': branch_offset,
-                    'length': random.randint(20, 40)
-                })
+            for i in range(3):
+                self.branch_offsets[i] = self.fx_rng.randint(-20, 20)
+                self.branch_lengths[i] = self.fx_rng.randint(20, 40)
         
-    def update(self):
+    def update(self, particles=None):
+        self.prev_x = self.x
+        self.prev_y = self.y
         self.x += self.speed * self.direction
         self.animation_frame += 1
         
         # Generate electric particles
-        if self.animation_frame % 2 == 0:
-            particle_count = 5 if self.enhanced else 2
-            for _ in range(particle_count):
-                px = self.x + random.randint(-10, 10)
-                py = self.y + random.randint(0, 60)
-                self.particles.append(Particle(px, py, CYAN, 
-                                              vel_x=random.uniform(-1, 1),
-                                              vel_y=random.uniform(-1, 1),
-                                              life=15))
-        
-        # Update particles
-        for particle in self.particles:
-            particle.update()
-        self.particles = [p for p in self.particles if p.life > 0]
+        if particles is not None and self.animation_frame % 2 == 0:
+            particles.emit(5 if self.enhanced else 2, self.x, self.y, CYAN,
+                           vel_x=(-1, 1), vel_y=(-1, 1), life=15,
+                           spread_x=(-10, 10), spread_y=(0, 60))
         
         # Remove if off screen
         if self.x < -50 or self.x > SCREEN_WIDTH + 50:
             self.active = False
             
-    def draw(self, screen):
-        # Draw particles first (glow effect)
-        for particle in self.particles:
-            particle.draw(screen)
-        
+    def draw(self, screen, alpha=1.0):
+        # Interpolate between the last two ticks
+        x = self.prev_x + (self.x - self.prev_x) * alpha
+        y = self.prev_y + (self.y - self.prev_y) * alpha
+
         # Main lightning bolt
         points = [
-            (self.x, self.y),
-            (self.x + 15 * self.direction, self.y + 25),
-            (self.x + 5 * self.direction, self.y + 25),
-            (self.x + 20 * self.direction, self.y + 60),
-            (self.x + 10 * self.direction, self.y + 40),
-            (self.x, self.y + 40)
+            (x, y),
+            (x + 15 * self.direction, y + 25),
+            (x + 5 * self.direction, y + 25),
+            (x + 20 * self.direction, y + 60),
+            (x + 10 * self.direction, y + 40),
+            (x, y + 40)
         ]
         
         # Draw glow effect (larger transparent bolt)
-        if self.enhanced:
-            glow_points = [(p[0] + random.randint(-2, 2), p[1] + random.randint(-2, 2)) for p in points]
-            pygame.draw.polygon(screen, CYAN, glow_points)
+        rect = None
+        if self.enhanced and quality.glow:
+            fx_rng = self.fx_rng
+            glow_points = [(p[0] + fx_rng.randint(-2, 2), p[1] + fx_rng.randint(-2, 2)) for p in points]
+            rect = pygame.draw.polygon(screen, CYAN, glow_points)
         
         # Flashing effect
         if self.animation_frame % 4 < 2:
-            pygame.draw.polygon(screen, WHITE, points)
-            pygame.draw.polygon(screen, CYAN if self.enhanced else YELLOW, points, 3)
+            bolt = pygame.draw.polygon(screen, WHITE, points)
+            outline = pygame.draw.polygon(screen, CYAN if self.enhanced else YELLOW, points, 3)
         else:
-            pygame.draw.polygon(screen, CYAN if self.enhanced else YELLOW, points)
-            pygame.draw.polygon(screen, WHITE, points, 3)
+            bolt = pygame.draw.polygon(screen, CYAN if self.enhanced else YELLOW, points)
+            outline = pygame.draw.polygon(screen, WHITE, points, 3)
+        bolt.union_ip(outline)
+        if rect:
+            bolt.union_ip(rect)
+        rect = bolt
         
         # Draw branches for enhanced lightning
-        if self.enhanced:
-            for branch in self.branches:
-                branch_x = self.x + branch['offset'] * self.direction
-                branch_y = self.y + 30
-                end_x = branch_x + branch['length'] * self.direction
-                end_y = branch_y + random.randint(-10, 10)
+        if self.enhanced and quality.branches:
+            for offset, length in zip(self.branch_offsets, self.branch_lengths):
+                branch_x = x + offset * self.direction
+                branch_y = y + 30
+                end_x = branch_x + length * self.direction
+                end_y = branch_y + self.fx_rng.randint(-10, 10)
                 
                 if self.animation_frame % 4 < 2:
-                    pygame.draw.line(screen, WHITE, (int(branch_x), int(branch_y)), (int(end_x), int(end_y)), 3)
+                    rect.union_ip(pygame.draw.line(screen, WHITE, (int(branch_x), int(branch_y)),
+                                                   (int(end_x), int(end_y)), 3))
                     pygame.draw.line(screen, CYAN, (int(branch_x), int(branch_y)), (int(end_x), int(end_y)), 1)
+        return rect
     
-    def get_rect(self):
-        return pygame.Rect(self.x, self.y, self.width, self.height)
-
-
-class Rocket:
-    def __init__(self, x, y, direction, target_y):
-        self.x = x
-        self.y = y
-        self.direction = direction
-        self.target_y = target_y
+    def bounds(self):
+        left = int(self.x)
+        top = int(self.y)
+        return left, top, left + self.width, top + self.height
+
+    def velocity(self):
+        return self.speed * self.direction, 0
+
+    def pack_state(self):
+        return self.STATE.pack(self.x, self.y, self.prev_x, self.prev_y, self.damage, self.speed,
+                               self.direction, self.active, self.enhanced, self.abilities.index(self.ability),
+                               self.angle, self.animation_frame)
+
+    def unpack_state(self, buffer, offset):
+        (self.x, self.y, self.prev_x, self.prev_y, self.damage, self.speed, self.direction, self.active,
+         self.enhanced, ability, self.angle, self.animation_frame) = self.STATE.unpack_from(buffer, offset)
+        self.ability = self.abilities[ability]
+        return offset + self.STATE.size
+
+    def pack_cosmetic(self):
+        return self.COSMETIC.pack(*self.branch_offsets, *self.branch_lengths)
+
+    def unpack_cosmetic(self, buffer, offset):
+        values = self.COSMETIC.unpack_from(buffer, offset)
+        self.branch_offsets[:] = values[:3]
+        self.branch_lengths[:] = values[3:]
+        return offset + self.COSMETIC.size
+
+
+class RocketTrails:
+    """Smoke trail ring buffers for a pool of rockets in one preallocated array.
+
+    Each rocket owns a row of ``points``: ``head`` is where its next point
+    goes and ``length`` how many points are filled. ``push`` records every
+    live rocket's position in one vectorized step and ``draw`` blits all
+    the trails from pre-baked puff sprites in a single ``blits`` call.
+    """
+    # Colorkeyed puff sprites by age index, baked on first draw and shared
+    puffs = []
+
+    def __init__(self, capacity, length=ROCKET_TRAIL_LENGTH):
+        self.points = np.zeros((capacity, length, 2))
+        self.head = np.zeros(capacity, dtype=np.intp)
+        self.length = np.zeros(capacity, dtype=np.intp)
+        self.allocated = 0
+        # Age index of each point in a row, oldest first
+        self.ages = np.arange(length)
+
+    def allocate(self):
+        """Return the row for a new rocket record."""
+        slot = self.allocated
+        if slot == len(self.points):
+            raise ValueError(f"all {slot} rocket trails are allocated")
+        self.allocated += 1
+        return slot
+
+    def clear(self, slot):
+        self.head[slot] = 0
+        self.length[slot] = 0
+
+    def slots(self, rockets):
+        return np.fromiter((rocket.slot for rocket in rockets), np.intp, len(rockets))
+
+    def push(self, rockets):
+        """Append each rocket's current position to its trail, dropping the oldest when full."""
+        n = len(rockets)
+        if n == 0:
+            return
+        slots = self.slots(rockets)
+        heads = self.head[slots]
+        self.points[slots, heads] = np.fromiter(
+            (value for rocket in rockets for value in (rocket.x, rocket.y)), float, n * 2).reshape(n, 2)
+        self.head[slots] = (heads + 1) % len(self.ages)
+        self.length[slots] = np.minimum(self.length[slots] + 1, len(self.ages))
+
+    def trail(self, slot):
+        """Return one rocket's trail as an (n, 2) array, oldest point first."""
+        length = self.length[slot]
+        return self.points[slot, (self.head[slot] - length + self.ages[:length]) % len(self.ages)]
+
+    def set_trail(self, slot, points):
+        length = len(points)
+        self.points[slot, :length] = points
+        self.head[slot] = length % len(self.ages)
+        self.length[slot] = length
+
+    def puff_sprites(self):
+        """Return smoke puff sprites indexed by radius (the puff at age ``i`` has radius ``i + 2``)."""
+        puffs = RocketTrails.puffs
+        while len(puffs) < len(self.ages) + 2:
+            radius = len(puffs)
+            # Opaque with a colorkey: RLE blits are much cheaper than per-pixel alpha
+            puff = pygame.Surface((radius * 2 + 1, radius * 2 + 1))
+            puff.set_colorkey(BLACK, pygame.RLEACCEL)
+            pygame.draw.circle(puff, GRAY, (radius, radius), radius)
+            puffs.append(puff)
+        return puffs
+
+    def draw(self, screen, rockets):
+        """Draw the trails of ``rockets`` and return the Rect bounding them, or None."""
+        n = len(rockets)
+        if n == 0:
+            return None
+        slots = self.slots(rockets)
+        lengths = self.length[slots]
+        # Lower quality drops the oldest puffs; a puff's size grows with its age index
+        rows, ages = np.nonzero((self.ages < lengths[:, None]) &
+                                (self.ages >= (lengths - quality.trail_length)[:, None]))
+        if len(rows) == 0:
+            return None
+        slots = slots[rows]
+        ring = (self.head[slots] - lengths[rows] + ages) % len(self.ages)
+        radii = ages + 2
+        corners = self.points[slots, ring].astype(np.int32) - radii[:, None]
+        puffs = self.puff_sprites()
+        screen.blits([(puffs[radius], pos) for radius, pos in zip(radii.tolist(), corners.tolist())],
+                     doreturn=False)
+        left, top = corners.min(axis=0).tolist()
+        right, bottom = (corners + radii[:, None] * 2 + 1).max(axis=0).tolist()
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+
+class Rocket(Projectile):
+    __slots__ = ('x', 'y', 'prev_x', 'prev_y', 'direction', 'target_y', 'width', 'height', 'damage', 'ability',
+                 'speed_x', 'speed_y', 'active', 'trails', 'slot', 'fx_rng')
+    # x, y, prev_x, prev_y, target_y, damage, speed_x, speed_y, direction, active, ability
+    STATE = struct.Struct('<8db?B')
+    abilities = ('rocket', 'barrage', 'homing')
+    homing = True
+
+    def __init__(self, trails, x=0, y=0, direction=1, target_y=0, fx_rng=None):
         self.width = 40
         self.height = 20
-        self.damage = 18
+        # Smoke trail lives in a row of the shared RocketTrails array
+        self.trails = trails
+        self.slot = trails.allocate()
+        self.activate(x, y, direction, target_y, fx_rng)
+
+    def activate(self, x, y, direction, target_y, fx_rng=None):
+        self.x = self.prev_x = x
+        self.y = self.prev_y = y
+        self.direction = direction
+        self.target_y = target_y
+        self.damage = ROCKET_DAMAGE
+        self.ability = 'rocket'
         self.speed_x = 8
         self.speed_y = 0
         self.active = True
-        self.trail = []
+        self.trails.clear(self.slot)
+        self.fx_rng = fx_rng if fx_rng is not None else random
+
+    @property
+    def speed(self):
+        # Horizontal speed, under the name ability volleys set
+        return self.speed_x
+
+    @speed.setter
+    def speed(self, value):
+        self.speed_x = value
         
     def update(self):
+        self.prev_x = self.x
+        self.prev_y = self.y
         self.x += self.speed_x * self.direction
         
         # Homing effect
@@ -178,54 +607,277 @@ class Rocket:
         self.speed_y = max(-5, min(5, self.speed_y))
         self.y += self.speed_y
         
-        # Add trail
-        self.trail.append((self.x, self.y))
-        if len(self.trail) > 10:
-            self.trail.pop(0)
-        
         # Remove if off screen
         if self.x < -50 or self.x > SCREEN_WIDTH + 50:
             self.active = False
             
-    def draw(self, screen):
-        # Draw smoke trail
-        for i, pos in enumerate(self.trail):
-            size = i + 2
-            pygame.draw.circle(screen, GRAY, (int(pos[0]), int(pos[1])), size)
-        
-        # Draw rocket body
+    def draw(self, screen, alpha=1.0):
+        # Smoke trails are drawn for the whole pool by RocketTrails.draw
+        # Draw rocket body, interpolated between the last two ticks
+        x = self.prev_x + (self.x - self.prev_x) * alpha
+        y = self.prev_y + (self.y - self.prev_y) * alpha
         if self.direction > 0:
             points = [
-                (self.x, self.y),
-                (self.x + 30, self.y - 8),
-                (self.x + 40, self.y),
-                (self.x + 30, self.y + 8)
+                (x, y),
+                (x + 30, y - 8),
+                (x + 40, y),
+                (x + 30, y + 8)
             ]
         else:
             points = [
-                (self.x, self.y),
-                (self.x - 30, self.y - 8),
-                (self.x - 40, self.y),
-                (self.x - 30, self.y + 8)
+                (x, y),
+                (x - 30, y - 8),
+                (x - 40, y),
+                (x - 30, y + 8)
             ]
             
-        pygame.draw.polygon(screen, RED, points)
-        pygame.draw.polygon(screen, DARK_RED, points, 2)
+        rect = pygame.draw.polygon(screen, RED, points)
+        rect.union_ip(pygame.draw.polygon(screen, DARK_RED, points, 2))
         
         # Draw flame
-        flame_x = self.x
-        if random.randint(0, 1):
-            pygame.draw.circle(screen, ORANGE, (int(flame_x - 10 * self.direction), int(self.y)), 6)
-            pygame.draw.circle(screen, YELLOW, (int(flame_x - 15 * self.direction), int(self.y)), 4)
+        flame_x = x
+        if self.fx_rng.randint(0, 1):
+            rect.union_ip(pygame.draw.circle(screen, ORANGE, (int(flame_x - 10 * self.direction), int(y)), 6))
+            rect.union_ip(pygame.draw.circle(screen, YELLOW, (int(flame_x - 15 * self.direction), int(y)), 4))
+        return rect
     
-    def get_rect(self):
-        return pygame.Rect(self.x - 20, self.y - 10, self.width, self.height)
+    def bounds(self):
+        left = int(self.x - 20)
+        top = int(self.y - 10)
+        return left, top, left + self.width, top + self.height
 
+    def velocity(self):
+        return self.speed_x * self.direction, self.speed_y
 
-class Character:
-    def __init__(self, x, y, controls, name):
-        self.x = x
+    def pack_state(self):
+        return self.STATE.pack(self.x, self.y, self.prev_x, self.prev_y, self.target_y, self.damage,
+                               self.speed_x, self.speed_y, self.direction, self.active,
+                               self.abilities.index(self.ability))
+
+    def unpack_state(self, buffer, offset):
+        (self.x, self.y, self.prev_x, self.prev_y, self.target_y, self.damage, self.speed_x, self.speed_y,
+         self.direction, self.active, ability) = self.STATE.unpack_from(buffer, offset)
+        self.ability = self.abilities[ability]
+        return offset + self.STATE.size
+
+    def pack_cosmetic(self):
+        trail = self.trails.trail(self.slot)
+        return struct.pack('<B', len(trail)) + trail.astype('<f8').tobytes()
+
+    def unpack_cosmetic(self, buffer, offset):
+        count = buffer[offset]
+        points = np.frombuffer(buffer, '<f8', count * 2, offset + 1).reshape(count, 2)
+        self.trails.set_trail(self.slot, points)
+        return offset + 1 + count * 16
+
+
+# Character classes by name, filled in as they are defined
+CHARACTERS = {}
+
+
+class AbilityDataError(ValueError):
+    """The ability definitions file is malformed."""
+
+
+class Volley:
+    """One compiled spawn pattern: ``count`` projectiles fanned out by position, speed or angle.
+
+    ``y`` is the spawn height below the fighter's top and ``y_step`` the offset
+    per projectile. ``speed`` (if set) replaces the projectile's own speed,
+    plus ``i * speed_step`` and up to ``speed_jitter`` of gameplay randomness;
+    ``angles`` gives one angle per projectile. ``damage`` (if set) replaces
+    the projectile's own damage before the hypercharge multiplier.
+    """
+    __slots__ = ('name', 'count', 'y', 'y_step', 'y_jitter', 'speed', 'speed_step', 'speed_jitter',
+                 'angles', 'damage')
+    FIELDS = {'count': int, 'y': int, 'y_step': int, 'y_jitter': int, 'speed': (int, float),
+              'speed_step': (int, float), 'speed_jitter': (int, float), 'angles': list,
+              'damage': (int, float)}
+
+    def __init__(self, name, count=1, y=0, y_step=0, y_jitter=0, speed=None, speed_step=0, speed_jitter=0,
+                 angles=None, damage=None):
+        self.name = name
         self.y = y
+        self.y_step = y_step
+        self.y_jitter = y_jitter
+        self.speed = speed
+        self.speed_step = speed_step
+        self.speed_jitter = speed_jitter
+        self.angles = tuple(angles) if angles is not None else None
+        # A fan of angles fires one projectile per angle
+        self.count = len(self.angles) if angles is not None else count
+        self.damage = damage
+
+
+class AbilityTable:
+    """A character's abilities compiled into parallel tuples indexed by ability slot.
+
+    ``volleys[slot]`` is a (normal, hypercharged) pair so the hot path can
+    index it with ``hypercharge_active`` instead of branching.
+    """
+    def __init__(self, names, labels, cooldowns, volleys, duration, cooldown,
+                 damage_multiplier, speed_multiplier, damage_taken, volley):
+        self.names = tuple(names)
+        self.labels = tuple(labels)
+        self.cooldowns = tuple(cooldowns)
+        self.volleys = tuple(volleys)
+        self.duration = duration
+        self.cooldown = cooldown
+        self.damage_multiplier = damage_multiplier
+        self.speed_multiplier = speed_multiplier
+        self.damage_taken = damage_taken
+        self.volley = volley
+
+
+def _number(value, where, kind=(int, float), low=None, high=None):
+    # Numbers may be given literally or as the name of a module constant, so
+    # balance overrides (tournament.py --set) reach the compiled tables
+    if isinstance(value, str):
+        if not value.isupper() or value not in globals():
+            raise AbilityDataError(f"{where}: unknown constant {value!r}")
+        value = globals()[value]
+    if isinstance(value, bool) or not isinstance(value, kind):
+        raise AbilityDataError(f"{where}: expected {'an integer' if kind is int else 'a number'}, got {value!r}")
+    if low is not None and value < low:
+        raise AbilityDataError(f"{where}: must be at least {low}, got {value!r}")
+    if high is not None and value > high:
+        raise AbilityDataError(f"{where}: must be at most {high}, got {value!r}")
+    return value
+
+
+def _fields(data, where, allowed):
+    if not isinstance(data, dict):
+        raise AbilityDataError(f"{where}: expected an object")
+    unknown = set(data) - set(allowed)
+    if unknown:
+        raise AbilityDataError(f"{where}: unknown fields {', '.join(sorted(unknown))}")
+
+
+def _volley(name, data, where, projectile):
+    _fields(data, where, Volley.FIELDS)
+    fields = {}
+    for field, value in data.items():
+        if field == 'angles':
+            if not isinstance(value, list) or not value:
+                raise AbilityDataError(f"{where}.angles: expected a non-empty list")
+            if 'angle' not in projectile.__slots__:
+                raise AbilityDataError(f"{where}.angles: {projectile.__name__} has no angle")
+            # Lightning packs its angle as a short in snapshots
+            fields[field] = [_number(angle, f"{where}.angles", int, -2 ** 15, 2 ** 15 - 1) for angle in value]
+        else:
+            fields[field] = _number(value, f"{where}.{field}", Volley.FIELDS[field])
+    if fields.get('count', 1) < 1:
+        raise AbilityDataError(f"{where}.count: must be at least 1")
+    return Volley(name, **fields)
+
+
+def _ability_table(cls, data):
+    where = cls.__name__
+    _fields(data, where, ('abilities', 'hypercharge'))
+    projectile = cls.projectile
+    names, labels, cooldowns, volleys = [], [], [], []
+    abilities = data.get('abilities')
+    if not isinstance(abilities, list) or not abilities:
+        raise AbilityDataError(f"{where}.abilities: expected a non-empty list")
+    # Every keyboard slot must be able to fire the whole kit
+    slots = min(len(controls['abilities']) for controls in FIGHTER_CONTROLS)
+    if len(abilities) > slots:
+        raise AbilityDataError(f"{where}.abilities: {len(abilities)} abilities but the controls bind {slots}")
+    for i, ability in enumerate(abilities):
+        at = f"{where}.abilities[{i}]"
+        _fields(ability, at, ('name', 'label', 'cooldown', 'hypercharged', *Volley.FIELDS))
+        name = ability.get('name')
+        if name not in projectile.abilities or name in names:
+            raise AbilityDataError(f"{at}.name: {name!r} is not a free {projectile.__name__} ability")
+        pattern = {field: value for field, value in ability.items() if field in Volley.FIELDS}
+        hypercharged = ability.get('hypercharged', {})
+        _fields(hypercharged, f"{at}.hypercharged", Volley.FIELDS)
+        names.append(name)
+        labels.append(str(ability.get('label', name.title())))
+        # Cooldowns count down to 0 and scale observations, so they start at 1
+        cooldowns.append(_number(ability.get('cooldown'), f"{at}.cooldown", int, 1))
+        volleys.append((_volley(name, pattern, at, projectile),
+                        _volley(name, {**pattern, **hypercharged}, f"{at}.hypercharged", projectile)))
+
+    hypercharge = data.get('hypercharge')
+    at = f"{where}.hypercharge"
+    _fields(hypercharge, at, ('duration', 'cooldown', 'damage_multiplier', 'speed_multiplier',
+                              'damage_taken', 'volley'))
+    volley = hypercharge.get('volley')
+    if volley is not None:
+        if 'hypercharge' not in projectile.abilities:
+            raise AbilityDataError(f"{at}.volley: {projectile.__name__} has no hypercharge ability")
+        volley = _volley('hypercharge', volley, f"{at}.volley", projectile)
+    return AbilityTable(
+        names, labels, cooldowns, volleys,
+        _number(hypercharge.get('duration'), f"{at}.duration", int, 1),
+        _number(hypercharge.get('cooldown'), f"{at}.cooldown", int, 1),
+        _number(hypercharge.get('damage_multiplier', 1.0), f"{at}.damage_multiplier"),
+        _number(hypercharge.get('speed_multiplier', 1.0), f"{at}.speed_multiplier"),
+        _number(hypercharge.get('damage_taken', 1.0), f"{at}.damage_taken"),
+        volley)
+
+
+def load_abilities(path=ABILITIES_PATH):
+    """Validate the ability definitions in ``path`` and install them on the character classes.
+
+    Every character in ``CHARACTERS`` needs an entry, and every entry needs a
+    character: the file only tunes existing ``Character`` subclasses, which
+    supply the art and ``spawn_projectile``, so a new character starts with a
+    subclass in code. Nothing is installed unless the whole file is valid; an
+    ``AbilityDataError`` names the first bad field. Call again after changing
+    a constant the file refers to.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise AbilityDataError(f"{path}: expected an object")
+    unknown = set(data) - set(CHARACTERS)
+    if unknown:
+        raise AbilityDataError(f"{path}: no Character subclass for {', '.join(sorted(unknown))}")
+    missing = set(CHARACTERS) - set(data)
+    if missing:
+        raise AbilityDataError(f"{path}: no abilities for {', '.join(sorted(missing))}")
+    tables = {name: _ability_table(CHARACTERS[name], entry) for name, entry in data.items()}
+    for name, table in tables.items():
+        cls = CHARACTERS[name]
+        count = len(table.names)
+        cls.abilities = table
+        cls.ability_names = (*table.names, 'hypercharge')
+        cls.STATE = struct.Struct(f'<7db4?4iI{count}i{count + 1}d')
+
+
+class Character:
+    """Base fighter.
+
+    ``rng`` drives gameplay randomness and ``fx_rng`` cosmetic effects; keeping
+    them separate lets a seed plus an input log reproduce a match exactly,
+    however often it is drawn.
+
+    Abilities come from ``abilities.json``: ``load_abilities`` compiles each
+    subclass's entry into an ``AbilityTable`` and sets the class attributes
+    below. Subclasses supply the art, their projectile pool and
+    ``spawn_projectile``; firing and cooldowns are shared.
+    """
+    # Compiled ability table, see load_abilities
+    abilities = None
+    # Names used to attribute damage, in the same order
+    ability_names = ()
+    # Snapshot layout: x, y, prev_x, prev_y, vel_x, vel_y, health, direction, on_ground,
+    # is_attacking, hypercharge_ready, hypercharge_active, attack_cooldown, hit_cooldown,
+    # hypercharge_cooldown, hypercharge_duration, hypercharge_uses, then the ability
+    # cooldowns and damage dealt per ability name (sized by load_abilities)
+    STATE = None
+    # Projectile class fired by every ability
+    projectile = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        CHARACTERS[cls.__name__] = cls
+
+    def __init__(self, x, y, controls, name, rng=None, fx_rng=None):
+        self.x = self.prev_x = x
+        self.y = self.prev_y = y
         self.width = 50
         self.height = 80
         self.vel_x = 0
@@ -237,6 +889,8 @@ class Character:
         self.max_health = 100
         self.controls = controls
         self.name = name
+        # Fighters only hit those on other teams; Match assigns them
+        self.team = 0
         self.direction = 1
         self.attack_cooldown = 0
         self.is_attacking = False
@@ -245,10 +899,37 @@ class Character:
         self.hypercharge_cooldown = 0
         self.hypercharge_active = False
         self.hypercharge_duration = 0
-        
+        self.hypercharge_uses = 0
+        self.ability_cooldowns = [0] * len(self.abilities.cooldowns)
+        self.damage_dealt = dict.fromkeys(self.ability_names, 0)
+        self.rng = rng if rng is not None else random
+        self.fx_rng = fx_rng if fx_rng is not None else random
+        count = len(self.abilities.cooldowns)
+        if count > len(controls['abilities']):
+            raise ValueError(f"{type(self).__name__} has {count} abilities but its controls bind "
+                             f"{len(controls['abilities'])}")
+        # Ability keys belong to the keyboard slot, not the class, so any roster
+        # plays with the same keys
+        self.ability_keys = controls['abilities'][:count]
+        self.hypercharge_key = controls['hypercharge']
+        # Input-mask bits: movement, every ability slot the controls bind, then
+        # hypercharge, so hypercharge keeps its bit however small the kit;
+        # slots the kit leaves empty have no key
+        slots = len(controls['abilities'])
+        input_keys = tuple(controls[d] for d in ('left', 'right', 'up', 'down')) + self.ability_keys
+        input_keys += (None,) * (slots - count) + (self.hypercharge_key,)
+        self.input_bits = tuple((1 << bit, key) for bit, key in enumerate(input_keys) if key is not None)
+        self.decoded_inputs = {}
+        
+    def particle_system(self, capacity):
+        return ParticleSystem(capacity, seed=self.fx_rng.getrandbits(64))
+
     def move(self, keys):
+        self.prev_x = self.x
+        self.prev_y = self.y
+
         # Speed boost during hypercharge
-        speed_mult = 1.5 if self.hypercharge_active else 1.0
+        speed_mult = self.abilities.speed_multiplier if self.hypercharge_active else 1.0
         
         # Horizontal movement
         self.vel_x = 0
@@ -300,565 +981,690 @@ class Character:
             self.hypercharge_active = False
             
     def take_damage(self, damage):
+        """Apply a hit and return the damage actually taken."""
         if self.hit_cooldown == 0:
             # Reduced damage during hypercharge
-            actual_damage = damage * 0.5 if self.hypercharge_active else damage
+            actual_damage = damage * self.abilities.damage_taken if self.hypercharge_active else damage
             self.health -= actual_damage
             self.hit_cooldown = 20
             if self.health < 0:
                 self.health = 0
-                
-    def get_rect(self):
-        return pygame.Rect(self.x, self.y, self.width, self.height)
+            return actual_damage
+        return 0
 
+    def record_damage(self, ability, damage):
+        self.damage_dealt[ability] += damage
 
-class Telesheepy(Character):
-    def __init__(self, x, y, controls):
-        super().__init__(x, y, controls, "Telesheepy")
-        self.lightnings = []
-        self.ability_cooldowns = {'1': 0, '2': 0, '3': 0}
-        self.particles = []
-        
-    def activate_hypercharge(self):
+    def activate_hypercharge(self, target=None):
         if self.hypercharge_ready:
+            table = self.abilities
             self.hypercharge_active = True
-            self.hypercharge_duration = 180  # 3 seconds at 60 FPS
-            self.hypercharge_cooldown = 900  # 15 seconds
+            self.hypercharge_duration = table.duration
+            self.hypercharge_cooldown = table.cooldown
+            self.hypercharge_uses += 1
             self.hypercharge_ready = False
-            
-            # Create massive lightning storm
-            for i in range(10):
-                lightning = Lightning(self.x + self.width // 2, self.y + 20, self.direction, enhanced=True)
-                lightning.y += random.randint(-30, 30)
-                lightning.speed = 10 + random.uniform(-2, 2)
-                lightning.damage = 30
-                self.lightnings.append(lightning)
-            
-            # Spawn electric particles
-            for _ in range(50):
-                self.particles.append(Particle(
-                    self.x + self.width // 2,
-                    self.y + 40,
-                    CYAN,
-                    vel_x=random.uniform(-5, 5),
-                    vel_y=random.uniform(-5, 5),
-                    life=60
-                ))
-        
-    def use_ability(self, keys):
-        # Hypercharge (4)
-        if keys[pygame.K_4]:
-            self.activate_hypercharge()
-        
+            if table.volley is not None:
+                self.fire(table.volley, target, 1.0)
+            self.hypercharge_effects()
+
+    def hypercharge_effects(self):
+        """Cosmetic burst when hypercharge starts."""
+
+    def use_ability(self, keys, target=None):
+        table = self.abilities
+        keys_by_slot = self.ability_keys
+        if keys[self.hypercharge_key]:
+            self.activate_hypercharge(target)
+
         # Enhanced abilities during hypercharge
-        damage_mult = 1.5 if self.hypercharge_active else 1.0
-        
-        # Lightning Strike (1) - Single bolt
-        if keys[pygame.K_1] and self.ability_cooldowns['1'] == 0:
-            lightning = Lightning(self.x + self.width // 2, self.y + 20, self.direction, self.hypercharge_active)
-            lightning.damage *= damage_mult
-            self.lightnings.append(lightning)
-            self.ability_cooldowns['1'] = 40
-            
-        # Thunder Storm (2) - Multiple bolts
-        if keys[pygame.K_2] and self.ability_cooldowns['2'] == 0:
-            count = 3 if not self.hypercharge_active else 5
-            for i in range(count):
-                lightning = Lightning(self.x + self.width // 2, self.y + 20 - i * 15, self.direction, self.hypercharge_active)
-                lightning.speed = 10 + i * 2
-                lightning.damage *= damage_mult
-                self.lightnings.append(lightning)
-            self.ability_cooldowns['2'] = 80
-            
-        # Lightning Wave (3) - Spread attack
-        if keys[pygame.K_3] and self.ability_cooldowns['3'] == 0:
-            angles = [-20, 0, 20] if not self.hypercharge_active else [-30, -15, 0, 15, 30]
-            for angle in angles:
-                lightning = Lightning(self.x + self.width // 2, self.y + 20, self.direction, self.hypercharge_active)
-                lightning.angle = angle
-                lightning.damage *= damage_mult
-                self.lightnings.append(lightning)
-            self.ability_cooldowns['3'] = 60
-            
+        hypercharged = self.hypercharge_active
+        damage_mult = table.damage_multiplier if hypercharged else 1.0
+
+        cooldowns = self.ability_cooldowns
+        for slot in range(len(cooldowns)):
+            if keys[keys_by_slot[slot]] and cooldowns[slot] == 0:
+                self.fire(table.volleys[slot][hypercharged], target, damage_mult)
+                cooldowns[slot] = table.cooldowns[slot]
+
         # Update cooldowns
-        for key in self.ability_cooldowns:
-            if self.ability_cooldowns[key] > 0:
-                self.ability_cooldowns[key] -= 1
+        for slot in range(len(cooldowns)):
+            if cooldowns[slot] > 0:
+                cooldowns[slot] -= 1
+
+    def fire(self, volley, target, damage_mult):
+        """Spawn the projectiles of one ``Volley`` from this fighter."""
+        x = self.x + self.width // 2
+        y = self.y + volley.y
+        rng = self.rng
+        for i in range(volley.count):
+            projectile = self.spawn_projectile(x, y + i * volley.y_step, target)
+            if volley.y_jitter:
+                projectile.y += rng.randint(-volley.y_jitter, volley.y_jitter)
+            if volley.speed is not None:
+                speed = volley.speed + i * volley.speed_step
+                if volley.speed_jitter:
+                    speed += rng.uniform(-volley.speed_jitter, volley.speed_jitter)
+                projectile.speed = speed
+            if volley.angles is not None:
+                projectile.angle = volley.angles[i]
+            if volley.damage is None:
+                projectile.damage *= damage_mult
+            else:
+                projectile.damage = volley.damage * damage_mult
+            projectile.ability = volley.name
+
+    def spawn_projectile(self, x, y, target):
+        """Spawn one projectile at (x, y), facing this fighter's direction, and return it."""
+        raise NotImplementedError
+
+    def pack_state(self):
+        return self.STATE.pack(self.x, self.y, self.prev_x, self.prev_y, self.vel_x, self.vel_y, self.health,
+                               self.direction, self.on_ground, self.is_attacking, self.hypercharge_ready,
+                               self.hypercharge_active, self.attack_cooldown, self.hit_cooldown,
+                               self.hypercharge_cooldown, self.hypercharge_duration, self.hypercharge_uses,
+                               *self.ability_cooldowns, *self.damage_dealt.values())
+
+    def unpack_state(self, buffer, offset):
+        values = self.STATE.unpack_from(buffer, offset)
+        (self.x, self.y, self.prev_x, self.prev_y, self.vel_x, self.vel_y, self.health,
+         self.direction, self.on_ground, self.is_attacking, self.hypercharge_ready,
+         self.hypercharge_active, self.attack_cooldown, self.hit_cooldown,
+         self.hypercharge_cooldown, self.hypercharge_duration, self.hypercharge_uses) = values[:17]
+        count = len(self.ability_cooldowns)
+        self.ability_cooldowns[:] = values[17:17 + count]
+        self.damage_dealt.update(zip(self.damage_dealt, values[17 + count:]))
+        return offset + self.STATE.size
                 
-    def update_projectiles(self):
+    def bounds(self):
+        left = int(self.x)
+        top = int(self.y)
+        return left, top, left + self.width, top + self.height
+
+    def encode_input(self, keys):
+        """Pack this fighter's held keys into a bitmask.
+
+        Bits 0-3 are left/right/up/down, bits 4-6 the ability slots and
+        bit 7 hypercharge.
+        """
+        mask = 0
+        for bit, key in self.input_bits:
+            if keys[key]:
+                mask |= bit
+        return mask
+
+    def decode_input(self, mask):
+        keys = self.decoded_inputs.get(mask)
+        if keys is None:
+            keys = KeyState(key for bit, key in self.input_bits if mask & bit)
+            self.decoded_inputs[mask] = keys
+        return keys
+
+    def tint_key(self):
+        """Return this frame's sprite tint: 'hit', a glow variant or None."""
+        if self.hit_cooldown > 0 and self.hit_cooldown % 4 < 2:
+            return 'hit'
+        if self.hypercharge_active:
+            return self.fx_rng.randrange(SpriteCache.GLOW_VARIANTS)
+        return None
+
+    def particle_systems(self):
+        return [value for value in vars(self).values() if isinstance(value, ParticleSystem)]
+
+    def particle_count(self):
+        return sum(len(system) for system in self.particle_systems())
+
+    def set_particles_enabled(self, enabled):
+        for system in self.particle_systems():
+            system.enabled = enabled
+
+
+class Telesheepy(Character):
+    projectile = Lightning
+
+    def __init__(self, x, y, controls, rng=None, fx_rng=None):
+        super().__init__(x, y, controls, "Telesheepy", rng, fx_rng)
+        self.lightnings = ProjectilePool(Lightning, LIGHTNING_CAPACITY)
+        self.particles = self.particle_system(512)
+        self.bolt_particles = self.particle_system(2048)
+
+    @property
+    def projectiles(self):
+        return self.lightnings
+
+    def spawn_projectile(self, x, y, target):
+        return self.lightnings.spawn(x, y, self.direction, self.hypercharge_active, self.fx_rng)
+
+    def hypercharge_effects(self):
+        # Spawn electric particles
+        self.particles.emit(50, self.x + self.width // 2, self.y + 40, CYAN,
+                            vel_x=(-5, 5), vel_y=(-5, 5), life=60)
+
+    def update_projectiles(self, enemies=None):
+        self.bolt_particles.update()
         for lightning in self.lightnings:
-            lightning.update()
-        self.lightnings = [l for l in self.lightnings if l.active]
+            lightning.update(self.bolt_particles)
+        self.lightnings.compact()
         
         # Update particles
-        for particle in self.particles:
-            particle.update()
-        self.particles = [p for p in self.particles if p.life > 0]
+        self.particles.update()
         
         # Generate particles during hypercharge
-        if self.hypercharge_active and random.random() < 0.3:
-            self.particles.append(Particle(
-                self.x + random.randint(0, self.width),
-                self.y + random.randint(0, self.height),
-                CYAN,
-                vel_x=random.uniform(-2, 2),
-                vel_y=random.uniform(-3, -1),
-                life=30
-            ))
-        
-    def draw(self, screen):
-        # Draw particles
-        for particle in self.particles:
-            particle.draw(screen)
+        if self.hypercharge_active and self.fx_rng.random() < 0.3:
+            self.particles.emit(1, self.x, self.y, CYAN,
+                                vel_x=(-2, 2), vel_y=(-3, -1), life=30,
+                                spread_x=(0, self.width), spread_y=(0, self.height))
         
-        # Draw character with hit flash
-        if self.hit_cooldown > 0 and self.hit_cooldown % 4 < 2:
-            color_offset = (50, 50, 50)
-        elif self.hypercharge_active:
-            # Electric glow during hypercharge
-            color_offset = (random.randint(0, 30), random.randint(0, 30), random.randint(50, 100))
-        else:
-            color_offset = (0, 0, 0)
-            
+    def glow_tint(self, rng):
+        # Electric glow during hypercharge
+        return (rng.randint(0, 30), rng.randint(0, 30), rng.randint(50, 100))
+
+    def draw_body(self, surface, x, y, color_offset, direction, aura):
         # Body (fluffy sheep)
-        body_color = tuple(max(0, min(255, c + color_offset[i])) for i, c in enumerate(WHITE))
-        pygame.draw.ellipse(screen, body_color, (self.x, self.y + 30, self.width, 50))
+        body_color = tint(WHITE, color_offset)
+        pygame.draw.ellipse(surface, body_color, (x, y + 30, self.width, 50))
         
         # Hypercharge aura
-        if self.hypercharge_active:
-            pygame.draw.ellipse(screen, CYAN, (self.x - 5, self.y + 25, self.width + 10, 60), 2)
+        if aura:
+            pygame.draw.ellipse(surface, CYAN, (x - 5, y + 25, self.width + 10, 60), 2)
         
         # Head
-        pygame.draw.circle(screen, body_color, (int(self.x + self.width // 2), int(self.y + 20)), 20)
+        pygame.draw.circle(surface, body_color, (int(x + self.width // 2), int(y + 20)), 20)
         
         # Teletubby ears
-        ear_color = tuple(max(0, min(255, c + color_offset[i])) for i, c in enumerate(PURPLE))
+        ear_color = tint(PURPLE, color_offset)
         # Left ear
-        pygame.draw.circle(screen, ear_color, (int(self.x + 10), int(self.y + 5)), 8)
-        pygame.draw.rect(screen, ear_color, (self.x + 5, self.y - 10, 10, 15))
-        pygame.draw.circle(screen, ear_color, (int(self.x + 10), int(self.y - 10)), 5)
+        pygame.draw.circle(surface, ear_color, (int(x + 10), int(y + 5)), 8)
+        pygame.draw.rect(surface, ear_color, (x + 5, y - 10, 10, 15))
+        pygame.draw.circle(surface, ear_color, (int(x + 10), int(y - 10)), 5)
         
         # Right ear
-        pygame.draw.circle(screen, ear_color, (int(self.x + 40), int(self.y + 5)), 8)
-        pygame.draw.rect(screen, ear_color, (self.x + 35, self.y - 10, 10, 15))
-        pygame.draw.circle(screen, ear_color, (int(self.x + 40), int(self.y - 10)), 5)
+        pygame.draw.circle(surface, ear_color, (int(x + 40), int(y + 5)), 8)
+        pygame.draw.rect(surface, ear_color, (x + 35, y - 10, 10, 15))
+        pygame.draw.circle(surface, ear_color, (int(x + 40), int(y - 10)), 5)
         
         # Face
-        eye_offset = 5 if self.direction > 0 else -5
-        pygame.draw.circle(screen, BLACK, (int(self.x + self.width // 2 - 8 + eye_offset), int(self.y + 18)), 3)
-        pygame.draw.circle(screen, BLACK, (int(self.x + self.width // 2 + 8 + eye_offset), int(self.y + 18)), 3)
-        pygame.draw.circle(screen, BLACK, (int(self.x + self.width // 2), int(self.y + 25)), 2)
+        eye_offset = 5 if direction > 0 else -5
+        pygame.draw.circle(surface, BLACK, (int(x + self.width // 2 - 8 + eye_offset), int(y + 18)), 3)
+        pygame.draw.circle(surface, BLACK, (int(x + self.width // 2 + 8 + eye_offset), int(y + 18)), 3)
+        pygame.draw.circle(surface, BLACK, (int(x + self.width // 2), int(y + 25)), 2)
         
         # Legs
-        pygame.draw.rect(screen, GRAY, (self.x + 10, self.y + 70, 8, 15))
-        pygame.draw.rect(screen, GRAY, (self.x + 32, self.y + 70, 8, 15))
+        pygame.draw.rect(surface, GRAY, (x + 10, y + 70, 8, 15))
+        pygame.draw.rect(surface, GRAY, (x + 32, y + 70, 8, 15))
+
+    def draw(self, screen, alpha=1.0):
+        """Draw the fighter and its effects, returning the Rects drawn to (None where nothing was)."""
+        # Draw particles
+        rects = [self.particles.draw(screen)]
         
-        # Draw projectiles
+        # Draw character from the sprite cache
+        rects.append(sprite_cache.draw(screen, self, alpha))
+        
+        # Draw projectiles, electric particles first (glow effect)
+        rects.append(self.bolt_particles.draw(screen))
         for lightning in self.lightnings:
-            lightning.draw(screen)
+            rects.append(lightning.draw(screen, alpha))
+        return rects
 
 
 class RocketHair(Character):
-    def __init__(self, x, y, controls):
-        super().__init__(x, y, controls, "Rocket Hair")
-        self.rockets = []
-        self.ability_cooldowns = {'7': 0, '8': 0, '9': 0}
-        self.particles = []
-
-    def activate_hypercharge(self, target=None):
-        if self.hypercharge_ready:
-            self.hypercharge_active = True
-            self.hypercharge_duration = 180  # 3 seconds
-            self.hypercharge_cooldown = 900  # 15 seconds
-            self.hypercharge_ready = False
-
-            # Visual explosion particles
-            for _ in range(100):
-                self.particles.append(Particle(
-                    self.x + self.width // 2,
-                    self.y + 40,
-                    random.choice([RED, ORANGE, YELLOW, WHITE]),
-                    vel_x=random.uniform(-8, 8),
-                    vel_y=random.uniform(-8, 8),
-                    life=60
-                ))
-
-            # Area explosion damage when activating
-            if target is not None:
-                explosion_radius = 120
-                explosion_damage = 35
-                rocket_center = pygame.Vector2(self.x + self.width // 2, self.y + self.height // 2)
-                target_center = pygame.Vector2(target.x + target.width // 2, target.y + target.height // 2)
-                distance = rocket_center.distance_to(target_center)
-                if distance < explosion_radius:
-                    target.take_damage(explosion_damage)
-
-            # Extra flash particles for style
-            for _ in range(30):
-                self.particles.append(Particle(
-                    self.x + self.width // 2,
-                    self.y + 40,
-                    random.choice([YELLOW, ORANGE, RED, WHITE]),
-                    vel_x=random.uniform(-10, 10),
-                    vel_y=random.uniform(-10, 10),
-                    life=30
-                ))
-
-    def use_ability(self, keys, target):
-        # Hypercharge (0)
-        if keys[pygame.K_0]:
-            self.activate_hypercharge(target)
-
-        damage_mult = 1.5 if self.hypercharge_active else 1.0
-
-        # Single Rocket (7)
-        if keys[pygame.K_7] and self.ability_cooldowns['7'] == 0:
-            rocket = Rocket(self.x + self.width // 2, self.y, self.direction, target.y + target.height // 2)
-            rocket.damage *= damage_mult
-            self.rockets.append(rocket)
-            self.ability_cooldowns['7'] = 40
-
-        # Rocket Barrage (8)
-        if keys[pygame.K_8] and self.ability_cooldowns['8'] == 0:
-            count = 3 if not self.hypercharge_active else 6
-            for i in range(count):
-                rocket = Rocket(self.x + self.width // 2, self.y - i * 20, self.direction, target.y + target.height // 2)
-                rocket.speed_x = 8 + random.uniform(-1, 1)
-                rocket.damage *= damage_mult
-                self.rockets.append(rocket)
-            self.ability_cooldowns['8'] = 80
-
-        # Homing Missile (9)
-        if keys[pygame.K_9] and self.ability_cooldowns['9'] == 0:
-            rocket = Rocket(self.x + self.width // 2, self.y, self.direction, target.y + target.height // 2)
-            rocket.speed_x = 12
-            rocket.damage = 25 * damage_mult
-            self.rockets.append(rocket)
-            self.ability_cooldowns['9'] = 100
-
-        # Update cooldowns
-        for key in self.ability_cooldowns:
-            if self.ability_cooldowns[key] > 0:
-                self.ability_cooldowns[key] -= 1
-
-    def update_projectiles(self, target):
-        for rocket in self.rockets:
-            rocket.target_y = target.y + target.height // 2
-            rocket.update()
-        self.rockets = [r for r in self.rockets if r.active]
+    projectile = Rocket
+
+    @property
+    def projectiles(self):
+        return self.rockets
+
+    def __init__(self, x, y, controls, rng=None, fx_rng=None):
+        super().__init__(x, y, controls, "Rocket Hair", rng, fx_rng)
+        self.trails = RocketTrails(ROCKET_CAPACITY + 1)
+        self.rockets = ProjectilePool(Rocket, ROCKET_CAPACITY, self.trails)
+        self.particles = self.particle_system(1024)
+
+    def spawn_projectile(self, x, y, target):
+        return self.rockets.spawn(x, y, self.direction, target.y + target.height // 2, self.fx_rng)
+
+    def hypercharge_effects(self):
+        # Spawn explosion particles
+        self.particles.emit(100, self.x + self.width // 2, self.y + 40,
+                            [RED, ORANGE, YELLOW, WHITE],
+                            vel_x=(-8, 8), vel_y=(-8, 8), life=60)
+
+    def update_projectiles(self, enemies):
+        rockets = self.rockets
+        targets = enemies.enemies(self.team)
+        if len(targets) > 1 and rockets:
+            # Each rocket homes on the enemy nearest to it
+            points = np.array([(rocket.x, rocket.y) for rocket in rockets])
+            for rocket, target_y in zip(rockets, enemies.nearest_centers(self.team, points)[:, 1].tolist()):
+                rocket.target_y = target_y
+                rocket.update()
+        elif targets:
+            target = targets[0]
+            for rocket in rockets:
+                rocket.target_y = target.y + target.height // 2
+                rocket.update()
+        else:
+            for rocket in rockets:
+                rocket.update()
+        self.trails.push(self.rockets)
+        self.rockets.compact()
 
         # Update particles
-        for particle in self.particles:
-            particle.update()
-        self.particles = [p for p in self.particles if p.life > 0]
+        self.particles.update()
 
         # Flame aura during hypercharge
-        if self.hypercharge_active and random.random() < 0.3:
-            self.particles.append(Particle(
-                self.x + random.randint(0, self.width),
-                self.y + random.randint(0, self.height),
-                random.choice([RED, ORANGE, YELLOW]),
-                vel_x=random.uniform(-2, 2),
-                vel_y=random.uniform(-3, -1),
-                life=30
-            ))
-
-    def draw(self, screen):
-        # Draw particles
-        for particle in self.particles:
-            particle.draw(screen)
+        if self.hypercharge_active and self.fx_rng.random() < 0.3:
+            self.particles.emit(1, self.x, self.y, [RED, ORANGE, YELLOW],
+                                vel_x=(-2, 2), vel_y=(-3, -1), life=30,
+                                spread_x=(0, self.width), spread_y=(0, self.height))
 
-        # Visual glow variations
-        if self.hit_cooldown > 0 and self.hit_cooldown % 4 < 2:
-            color_offset = (50, 50, 50)
-        elif self.hypercharge_active:
-            color_offset = (random.randint(50, 100), random.randint(0, 30), 0)
-        else:
-            color_offset = (0, 0, 0)
+    def glow_tint(self, rng):
+        # Flame glow during hypercharge
+        return (rng.randint(50, 100), rng.randint(0, 30), 0)
 
+    def draw_body(self, surface, x, y, color_offset, direction, aura):
         # Body
-        body_color = tuple(max(0, min(255, c + color_offset[i])) for i, c in enumerate(BLUE))
-        pygame.draw.rect(screen, body_color, (self.x + 10, self.y + 30, 30, 40))
+        body_color = tint(BLUE, color_offset)
+        pygame.draw.rect(surface, body_color, (x + 10, y + 30, 30, 40))
 
         # Hypercharge aura
-        if self.hypercharge_active:
-            pygame.draw.rect(screen, ORANGE, (self.x + 5, self.y + 25, 40, 50), 2)
+        if aura:
+            pygame.draw.rect(surface, ORANGE, (x + 5, y + 25, 40, 50), 2)
 
         # Arms
-        pygame.draw.rect(screen, body_color, (self.x, self.y + 35, 10, 25))
-        pygame.draw.rect(screen, body_color, (self.x + 40, self.y + 35, 10, 25))
+        pygame.draw.rect(surface, body_color, (x, y + 35, 10, 25))
+        pygame.draw.rect(surface, body_color, (x + 40, y + 35, 10, 25))
 
         # Legs
-        leg_color = tuple(max(0, min(255, c + color_offset[i])) for i, c in enumerate(GRAY))
-        pygame.draw.rect(screen, leg_color, (self.x + 15, self.y + 70, 8, 15))
-        pygame.draw.rect(screen, leg_color, (self.x + 27, self.y + 70, 8, 15))
+        leg_color = tint(GRAY, color_offset)
+        pygame.draw.rect(surface, leg_color, (x + 15, y + 70, 8, 15))
+        pygame.draw.rect(surface, leg_color, (x + 27, y + 70, 8, 15))
 
         # Head base
-        head_color = tuple(max(0, min(255, c + color_offset[i])) for i, c in enumerate((255, 220, 180)))
-        pygame.draw.circle(screen, head_color, (int(self.x + self.width // 2), int(self.y + 20)), 15)
+        head_color = tint((255, 220, 180), color_offset)
+        pygame.draw.circle(surface, head_color, (int(x + self.width // 2), int(y + 20)), 15)
 
         # Rocket head
-        rocket_color = tuple(max(0, min(255, c + color_offset[i])) for i, c in enumerate(RED))
-        pygame.draw.polygon(screen, rocket_color, [
-            (self.x + self.width // 2 - 10, self.y + 5),
-            (self.x + self.width // 2 + 10, self.y + 5),
-            (self.x + self.width // 2 + 10, self.y - 15),
-            (self.x + self.width // 2 - 10, self.y - 15)
+        rocket_color = tint(RED, color_offset)
+        pygame.draw.polygon(surface, rocket_color, [
+            (x + self.width // 2 - 10, y + 5),
+            (x + self.width // 2 + 10, y + 5),
+            (x + self.width // 2 + 10, y - 15),
+            (x + self.width // 2 - 10, y - 15)
         ])
-        pygame.draw.polygon(screen, DARK_RED, [
-            (self.x + self.width // 2 - 10, self.y - 15),
-            (self.x + self.width // 2 + 10, self.y - 15),
-            (self.x + self.width // 2, self.y - 25)
+        pygame.draw.polygon(surface, DARK_RED, [
+            (x + self.width // 2 - 10, y - 15),
+            (x + self.width // 2 + 10, y - 15),
+            (x + self.width // 2, y - 25)
         ])
 
         # Rocket fins
-        pygame.draw.polygon(screen, ORANGE, [
-            (self.x + self.width // 2 - 10, self.y + 5),
-            (self.x + self.width // 2 - 15, self.y + 5),
-            (self.x + self.width // 2 - 10, self.y - 5)
+        pygame.draw.polygon(surface, ORANGE, [
+            (x + self.width // 2 - 10, y + 5),
+            (x + self.width // 2 - 15, y + 5),
+            (x + self.width // 2 - 10, y - 5)
         ])
-        pygame.draw.polygon(screen, ORANGE, [
-            (self.x + self.width // 2 + 10, self.y + 5),
-            (self.x + self.width // 2 + 15, self.y + 5),
-            (self.x + self.width // 2 + 10, self.y - 5)
+        pygame.draw.polygon(surface, ORANGE, [
+            (x + self.width // 2 + 10, y + 5),
+            (x + self.width // 2 + 15, y + 5),
+            (x + self.width // 2 + 10, y - 5)
         ])
 
         # Face
-        eye_offset = 3 if self.direction > 0 else -3
-        pygame.draw.circle(screen, BLACK, (int(self.x + self.width // 2 - 5 + eye_offset), int(self.y + 18)), 2)
-        pygame.draw.circle(screen, BLACK, (int(self.x + self.width // 2 + 5 + eye_offset), int(self.y + 18)), 2)
+        eye_offset = 3 if direction > 0 else -3
+        pygame.draw.circle(surface, BLACK, (int(x + self.width // 2 - 5 + eye_offset), int(y + 18)), 2)
+        pygame.draw.circle(surface, BLACK, (int(x + self.width // 2 + 5 + eye_offset), int(y + 18)), 2)
 
-        # Draw projectiles
-        for rocket in self.rockets:
-            rocket.draw(screen)
-    def __init__(self, x, y, controls):
-        super().__init__(x, y, controls, "Rocket Hair")
-        self.rockets = []
-        self.ability_cooldowns = {'7': 0, '8': 0, '9': 0}
-        self.particles = []
-        
-    def activate_hypercharge(self):
-        if self.hypercharge_ready:
-            self.hypercharge_active = True
-            self.hypercharge_duration = 180  # 3 seconds
-            self.hypercharge_cooldown = 900  # 15 seconds
-            self.hypercharge_ready = False
-            
-            # Spawn explosion particles
-            for _ in range(100):
-                self.particles.append(Particle(
-                    self.x + self.width // 2,
-                    self.y + 40,
-                    random.choice([RED, ORANGE, YELLOW, WHITE]),
-                    vel_x=random.uniform(-8, 8),
-                    vel_y=random.uniform(-8, 8),
-                    life=60
-                ))
-        
-    def use_ability(self, keys, target):
-        # Hypercharge (0)
-        if keys[pygame.K_0]:
-            self.activate_hypercharge()
-        
-        damage_mult = 1.5 if self.hypercharge_active else 1.0
-        
-        # Single Rocket (7)
-        if keys[pygame.K_7] and self.ability_cooldowns['7'] == 0:
-            rocket = Rocket(self.x + self.width // 2, self.y, self.direction, target.y + target.height // 2)
-            rocket.damage *= damage_mult
-            self.rockets.append(rocket)
-            self.ability_cooldowns['7'] = 40
-            
-        # Rocket Barrage (8)
-        if keys[pygame.K_8] and self.ability_cooldowns['8'] == 0:
-            count = 3 if not self.hypercharge_active else 6
-            for i in range(count):
-                rocket = Rocket(self.x + self.width // 2, self.y - i * 20, self.direction, target.y + target.height // 2)
-                rocket.speed_x = 8 + random.uniform(-1, 1)
-                rocket.damage *= damage_mult
-                self.rockets.append(rocket)
-            self.ability_cooldowns['8'] = 80
-            
-        # Homing Missile (9)
-        if keys[pygame.K_9] and self.ability_cooldowns['9'] == 0:
-            rocket = Rocket(self.x + self.width // 2, self.y, self.direction, target.y + target.height // 2)
-            rocket.speed_x = 12
-            rocket.damage = 25 * damage_mult
-            self.rockets.append(rocket)
-            self.ability_cooldowns['9'] = 100
-            
-        # Update cooldowns
-        for key in self.ability_cooldowns:
-            if self.ability_cooldowns[key] > 0:
-                self.ability_cooldowns[key] -= 1
-                
-    def update_projectiles(self, target):
-        for rocket in self.rockets:
-            rocket.target_y = target.y + target.height // 2
-            rocket.update()
-        self.rockets = [r for r in self.rockets if r.active]
-        
-        # Update particles
-        for particle in self.particles:
-            particle.update()
-        self.particles = [p for p in self.particles if p.life > 0]
-        
-        # Generate flame particles during hypercharge
-        if self.hypercharge_active and random.random() < 0.3:
-            self.particles.append(Particle(
-                self.x + random.randint(0, self.width),
-                self.y + random.randint(0, self.height),
-                random.choice([RED, ORANGE, YELLOW]),
-                vel_x=random.uniform(-2, 2),
-                vel_y=random.uniform(-3, -1),
-                life=30
-            ))
-        
-    def draw(self, screen):
+    def draw(self, screen, alpha=1.0):
+        """Draw the fighter and its effects, returning the Rects drawn to (None where nothing was)."""
         # Draw particles
-        for particle in self.particles:
-            particle.draw(screen)
-        
-        # Draw character with hit flash
-        if self.hit_cooldown > 0 and self.hit_cooldown % 4 < 2:
-            color_offset = (50, 50, 50)
-        elif self.hypercharge_active:
-            # Flame glow during hypercharge
-            color_offset = (random.randint(50, 100), random.randint(0, 30), 0)
-        else:
-            color_offset = (0, 0, 0)
-            
-        # Body
-        body_color = tuple(max(0, min(255, c + color_offset[i])) for i, c in enumerate(BLUE))
-        pygame.draw.rect(screen, body_color, (self.x + 10, self.y + 30, 30, 40))
-        
-        # Hypercharge aura
-        if self.hypercharge_active:
-            pygame.draw.rect(screen, ORANGE, (self.x + 5, self.y + 25, 40, 50), 2)
-        
-        # Arms
-        pygame.draw.rect(screen, body_color, (self.x, self.y + 35, 10, 25))
-        pygame.draw.rect(screen, body_color, (self.x + 40, self.y + 35, 10, 25))
-        
-        # Legs
-        leg_color = tuple(max(0, min(255, c + color_offset[i])) for i, c in enumerate(GRAY))
-        pygame.draw.rect(screen, leg_color, (self.x + 15, self.y + 70, 8, 15))
-        pygame.draw.rect(screen, leg_color, (self.x + 27, self.y + 70, 8, 15))
-        
-        # Regular head base
-        head_color = tuple(max(0, min(255, c + color_offset[i])) for i, c in enumerate((255, 220, 180)))
-        pygame.draw.circle(screen, head_color, (int(self.x + self.width // 2), int(self.y + 20)), 15)
-        
-        # Rocket head
-        rocket_color = tuple(max(0, min(255, c + color_offset[i])) for i, c in enumerate(RED))
-        pygame.draw.polygon(screen, rocket_color, [
-            (self.x + self.width // 2 - 10, self.y + 5),
-            (self.x + self.width // 2 + 10, self.y + 5),
-            (self.x + self.width // 2 + 10, self.y - 15),
-            (self.x + self.width // 2 - 10, self.y - 15)
-        ])
-        pygame.draw.polygon(screen, DARK_RED, [
-            (self.x + self.width // 2 - 10, self.y - 15),
-            (self.x + self.width // 2 + 10, self.y - 15),
-            (self.x + self.width // 2, self.y - 25)
-        ])
-        
-        # Rocket fins
-        pygame.draw.polygon(screen, ORANGE, [
-            (self.x + self.width // 2 - 10, self.y + 5),
-            (self.x + self.width // 2 - 15, self.y + 5),
-            (self.x + self.width // 2 - 10, self.y - 5)
-        ])
-        pygame.draw.polygon(screen, ORANGE, [
-            (self.x + self.width // 2 + 10, self.y + 5),
-            (self.x + self.width // 2 + 15, self.y + 5),
-            (self.x + self.width // 2 + 10, self.y - 5)
-        ])
-        
-        # Face
-        eye_offset = 3 if self.direction > 0 else -3
-        pygame.draw.circle(screen, BLACK, (int(self.x + self.width // 2 - 5 + eye_offset), int(self.y + 18)), 2)
-        pygame.draw.circle(screen, BLACK, (int(self.x + self.width // 2 + 5 + eye_offset), int(self.y + 18)), 2)
-        
-        # Draw projectiles
-        for rocket in self.rockets:
-            rocket.draw(screen)
+        rects = [self.particles.draw(screen)]
 
+        # Draw character from the sprite cache
+        rects.append(sprite_cache.draw(screen, self, alpha))
 
-class Cloud:
-    def __init__(self, x, y, speed):
-        self.x = x
-        self.y = y
-        self.speed = speed
-        
-    def update(self):
-        self.x += self.speed
-        if self.x > SCREEN_WIDTH + 100:
-            self.x = -100
-            
-    def draw(self, screen):
-        pygame.draw.circle(screen, WHITE, (int(self.x), int(self.y)), 30)
-        pygame.draw.circle(screen, WHITE, (int(self.x + 25), int(self.y)), 35)
-        pygame.draw.circle(screen, WHITE, (int(self.x + 50), int(self.y)), 30)
-
-
-class Star:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.brightness = random.randint(100, 255)
-        self.twinkle_speed = random.uniform(0.02, 0.05)
-        self.phase = random.uniform(0, math.pi * 2)
-        
-    def update(self):
-        self.phase += self.twinkle_speed
-        self.brightness = int(150 + 105 * math.sin(self.phase))
-        
-    def draw(self, screen):
-        color = (self.brightness, self.brightness, self.brightness)
-        pygame.draw.circle(screen, color, (int(self.x), int(self.y)), 2)
-
-class PixelChicken:
-    """Cute animated chicken walking around the background."""
-    def __init__(self, x, y, speed):
-        self.x = x
-        self.y = y
-        self.speed = speed
-        self.direction = 1 if random.random() < 0.5 else -1
-        self.frame = random.randint(0, 60)
-
-    def update(self):
-        self.x += self.speed * self.direction
-        self.frame += 1
-
-        # Randomly turn around
-        if random.random() < 0.003:
-            self.direction *= -1
-
-        # Wrap around screen
-        if self.x < -40:
-            self.x = SCREEN_WIDTH + 40
-        elif self.x > SCREEN_WIDTH + 40:
-            self.x = -40
-
-    def draw(self, screen):
-        walk_bob = math.sin(self.frame * 0.2) * 2
-
-        body_x = int(self.x)
-        body_y = int(self.y + walk_bob)
-
+        # Draw projectiles, all smoke trails in one pass first
+        rects.append(self.trails.draw(screen, self.rockets))
+        for rocket in self.rockets:
+            rects.append(rocket.draw(screen, alpha))
+        return rects
+
+
+load_abilities()
+
+
+class World:
+    """Entities stored as rows of contiguous component arrays.
+
+    An entity is a row index. ``components[row]`` is a bit set of the
+    TRANSFORM, VELOCITY, LIFETIME, COLLIDER and RENDERABLE components it has,
+    and each component is a handful of numpy columns. Systems pick the rows
+    that have their components with a mask and update them all in one array
+    operation, so more entities cost array length rather than Python method
+    calls. Rows of dead entities are reused.
+    """
+    TRANSFORM = 1
+    VELOCITY = 2
+    LIFETIME = 4
+    COLLIDER = 8
+    RENDERABLE = 16
+
+    # Column name -> (dtype, shape per entity, fill value)
+    COLUMNS = {
+        'alive': (bool, (), False),
+        'components': (np.uint8, (), 0),
+        # Transform: position, and the x range it wraps around (lo, hi), nan for none
+        'position': (np.float64, (2,), 0.0),
+        'wrap': (np.float64, (2,), np.nan),
+        # Velocity: per tick, plus a vertical bob of amplitude * sin(clock * 0.002 + phase)
+        # and a per-tick chance to turn around
+        'velocity': (np.float64, (2,), 0.0),
+        'bob': (np.float64, (2,), 0.0),
+        'turn_chance': (np.float64, (), 0.0),
+        # Lifetime: the world tick it started and the tick it ends; rows without one never end
+        'born': (np.int64, (), 0),
+        'expires': (np.int64, (), np.iinfo(np.int64).max),
+        # Collider: box size from the position, and the layers it is on
+        'size': (np.float64, (2,), 0.0),
+        'layers': (np.uint32, (), 0),
+        # Renderable: drawing kind, colour, animation phase and its speed, brightness
+        'kind': (np.int8, (), -1),
+        'color': (np.uint8, (3,), 0),
+        'phase': (np.float64, (), 0.0),
+        'phase_speed': (np.float64, (), 0.0),
+        'shade': (np.int32, (), 0),
+    }
+
+    def __init__(self, capacity=64, rng=random):
+        # Randomness for the systems
+        self.rng = rng
+        # Ticks run by expire, the clock lifetimes are measured on
+        self.ticks = 0
+        self.capacity = 0
+        # Rows below this have been used; free holds the dead ones among them
+        self.count = 0
+        self.free = []
+        self.selections = {}
+        for name, (dtype, shape, fill) in self.COLUMNS.items():
+            setattr(self, name, np.full((0, *shape), fill, dtype))
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        for name, (dtype, shape, fill) in self.COLUMNS.items():
+            column = np.full((capacity, *shape), fill, dtype)
+            column[:self.capacity] = getattr(self, name)
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def spawn(self, x, y):
+        """Add an entity with a transform at (x, y) and return its row."""
+        self.selections.clear()
+        if self.free:
+            row = self.free.pop()
+        else:
+            if self.count == self.capacity:
+                self.grow(self.capacity * 2)
+            row = self.count
+            self.count += 1
+        self.alive[row] = True
+        self.components[row] = self.TRANSFORM
+        self.position[row] = x, y
+        return row
+
+    def kill(self, row):
+        self.selections.clear()
+        self.reset(row)
+        self.free.append(row)
+
+    def reset(self, row):
+        for name, (dtype, shape, fill) in self.COLUMNS.items():
+            getattr(self, name)[row] = fill
+
+    def add_velocity(self, row, vel_x, vel_y=0.0, bob=0.0, bob_phase=0.0, turn_chance=0.0):
+        self.selections.clear()
+        self.components[row] |= self.VELOCITY
+        self.velocity[row] = vel_x, vel_y
+        self.bob[row] = bob, bob_phase
+        self.turn_chance[row] = turn_chance
+
+    def add_lifetime(self, row, ttl):
+        self.selections.clear()
+        self.components[row] |= self.LIFETIME
+        self.born[row] = self.ticks
+        self.expires[row] = self.ticks + ttl
+
+    def add_collider(self, row, width, height, layers=1):
+        self.selections.clear()
+        self.components[row] |= self.COLLIDER
+        self.size[row] = width, height
+        self.layers[row] = layers
+
+    def add_renderable(self, row, kind, color=BLACK, phase=0.0, phase_speed=0.0, shade=0):
+        self.selections.clear()
+        self.components[row] |= self.RENDERABLE
+        self.kind[row] = kind
+        self.color[row] = color
+        self.phase[row] = phase
+        self.phase_speed[row] = phase_speed
+        self.shade[row] = shade
+
+    def select(self, key, compute):
+        # Row selections only change when entities or their components do
+        rows = self.selections.get(key)
+        if rows is None:
+            rows = self.selections[key] = compute()
+        return rows
+
+    def rows(self, components):
+        """Return the rows that have all of ``components``, in row order."""
+        return self.select(components, lambda: np.flatnonzero(
+            self.components[:self.count] & components == components))
+
+    def of_kind(self, kind):
+        """Return the renderable rows of one kind, in row order."""
+        def compute():
+            rows = self.rows(self.RENDERABLE)
+            return rows[self.kind[rows] == kind]
+        return self.select(('kind', kind), compute)
+
+    def update(self, clock):
+        """Run every system for one tick; ``clock`` is in milliseconds and drives the bobbing."""
+        self.animate()
+        self.move(clock)
+        self.expire()
+
+    # Systems work on whole columns where they can: rows without a component
+    # hold its neutral values (no velocity, no phase speed), so updating them is a no-op
+
+    def animate(self):
+        count = self.count
+        self.phase[:count] += self.phase_speed[:count]
+        stars = self.of_kind(DECORATION_STAR)
+        self.shade[stars] = 150 + 105 * np.sin(self.phase[stars])
+
+    def move(self, clock):
+        # Collider boxes follow the positions
+        self.selections.pop('colliders', None)
+        count = self.count
+        position = self.position[:count]
+        position += self.velocity[:count]
+        bobbing = self.select('bobbing', lambda: np.flatnonzero(self.bob[:self.count, 0]))
+        if len(bobbing):
+            amplitude, phase = self.bob[bobbing].T
+            position[bobbing, 1] += np.sin(clock * 0.002 + phase) * amplitude
+
+        # Turn around at random, one draw per turning entity in row order
+        turning = self.select('turning', lambda: np.flatnonzero(self.turn_chance[:self.count]))
+        if len(turning):
+            rng = self.rng
+            draws = np.array([rng.random() for _ in range(len(turning))])
+            self.velocity[turning[draws < self.turn_chance[turning]], 0] *= -1
+
+        # Wrap around the x range
+        x = position[:, 0]
+        wrap = self.wrap[:count]
+        low = x < wrap[:, 0]
+        high = x > wrap[:, 1]
+        x[low] = wrap[low, 1]
+        x[high] = wrap[high, 0]
+
+    def expire(self):
+        self.ticks += 1
+        # Lifetimes are stored as end ticks, so rows are only scanned once the soonest is up
+        due = self.select('due', lambda: int(self.expires[:self.count].min(initial=np.iinfo(np.int64).max)))
+        if self.ticks < due:
+            return
+        for row in np.flatnonzero(self.expires[:self.count] <= self.ticks).tolist():
+            self.kill(row)
+
+    def colliding(self, boxes, layers=0xFFFFFFFF):
+        """Test (left, top, right, bottom) boxes against the colliders on any of ``layers``.
+
+        Returns the collider rows and a boolean array with a row per box and
+        a column per collider, computed in one pass however many there are of
+        each. Match collects pickups by passing every fighter's box once a tick.
+        """
+        colliders = self.select('colliders', dict)
+        if layers not in colliders:
+            rows = np.flatnonzero((self.components[:self.count] & self.COLLIDER != 0)
+                                  & (self.layers[:self.count] & layers != 0))
+            low = self.position[rows]
+            # Ends, then negated starts, so one comparison covers all four edges
+            colliders[layers] = rows, np.concatenate((low + self.size[rows], -low), axis=1)
+        rows, limits = colliders[layers]
+        # A box overlaps a collider when it starts before the collider ends and
+        # ends after it starts, on both axes
+        starts = np.array([(left, top, -right, -bottom) for left, top, right, bottom in boxes], np.float64)
+        hits = (starts.reshape(-1, 1, 4) < limits).all(axis=2)
+        return rows, hits
+
+    def pack_state(self):
+        """Return the used rows as bytes: tick, row count, free rows, then each column."""
+        count = self.count
+        parts = [struct.pack(f'<IHH{len(self.free)}H', self.ticks, count, len(self.free), *self.free)]
+        parts += [getattr(self, name)[:count].tobytes() for name in self.COLUMNS]
+        return b"".join(parts)
+
+    def unpack_state(self, buffer, offset):
+        """Load rows packed by ``pack_state`` and return the offset after them."""
+        # Rollback restores the same world over and over; leave it be when nothing differs
+        current = self.pack_state()
+        if buffer[offset:offset + len(current)] == current:
+            return offset + len(current)
+        self.selections.clear()
+        self.ticks, count, free = struct.unpack_from('<IHH', buffer, offset)
+        offset += 8
+        self.free = list(struct.unpack_from(f'<{free}H', buffer, offset))
+        offset += 2 * free
+        if count > self.capacity:
+            self.grow(max(count, self.capacity * 2))
+        for name, (dtype, shape, fill) in self.COLUMNS.items():
+            column = getattr(self, name)
+            column[count:self.count] = fill
+            column = column[:count]
+            column[...] = np.frombuffer(buffer, dtype, column.size, offset).reshape(column.shape)
+            offset += column.nbytes
+        self.count = count
+        return offset
+
+
+# Background decoration kinds, drawn in this order
+DECORATION_STAR = 0
+DECORATION_CANDY = 1
+DECORATION_CHICKEN = 2
+DECORATION_CLOUD = 3
+
+CANDY_COLORS = [
+    (255, 100, 150),
+    (255, 160, 100),
+    (230, 100, 255),
+    (150, 200, 255),
+    (120, 255, 150)
+]
+
+
+def spawn_cloud(world, rng=random):
+    row = world.spawn(rng.randint(0, SCREEN_WIDTH), rng.randint(50, 150))
+    world.wrap[row] = -100, SCREEN_WIDTH + 100
+    world.add_velocity(row, rng.uniform(0.2, 0.5))
+    world.add_renderable(row, DECORATION_CLOUD, WHITE)
+    return row
+
+
+def spawn_star(world, rng=random):
+    row = world.spawn(rng.randint(0, SCREEN_WIDTH), rng.randint(0, GROUND - 100))
+    brightness = rng.randint(100, 255)
+    twinkle_speed = rng.uniform(0.02, 0.05)
+    world.add_renderable(row, DECORATION_STAR, phase=rng.uniform(0, math.pi * 2), phase_speed=twinkle_speed,
+                         shade=brightness)
+    return row
+
+
+def spawn_chicken(world, rng=random):
+    """Cute animated chicken walking around the background; the phase counts animation frames."""
+    row = world.spawn(rng.randint(0, SCREEN_WIDTH), GROUND - rng.randint(20, 90))
+    speed = rng.uniform(0.3, 0.7)
+    direction = 1 if rng.random() < 0.5 else -1
+    world.wrap[row] = -40, SCREEN_WIDTH + 40
+    world.add_velocity(row, speed * direction, turn_chance=0.003)
+    world.add_renderable(row, DECORATION_CHICKEN, phase=rng.randint(0, 60), phase_speed=1)
+    return row
+
+
+def spawn_candy(world, rng=random):
+    """Bright wrapped candy floating gently in background; the phase is its spin."""
+    row = world.spawn(rng.randint(0, SCREEN_WIDTH), rng.randint(80, GROUND - 200))
+    drift = rng.uniform(-0.15, 0.15)
+    color = rng.choice(CANDY_COLORS)
+    spin = rng.uniform(0, 2 * math.pi)
+    spin_speed = rng.uniform(0.01, 0.03)
+    world.wrap[row] = -30, SCREEN_WIDTH + 30
+    world.add_velocity(row, drift, bob=0.2, bob_phase=rng.uniform(0, 2 * math.pi))
+    world.add_renderable(row, DECORATION_CANDY, color, phase=spin, phase_speed=spin_speed)
+    return row
+
+
+def draw_stars(screen, world, rows):
+    # Stars behind the mountains stay hidden
+    rows = rows[background_layers.visible(world.position[rows])]
+    rects = []
+    circle = pygame.draw.circle
+    for (x, y), shade in zip(world.position[rows].astype(int).tolist(), world.shade[rows].tolist()):
+        rects.append(circle(screen, (shade, shade, shade), (x, y), 2))
+    return rects
+
+
+def draw_clouds(screen, world, rows):
+    rects = []
+    circle = pygame.draw.circle
+    for (x, y), color in zip(world.position[rows].tolist(), world.color[rows].tolist()):
+        rect = circle(screen, color, (int(x), int(y)), 30)
+        rect.union_ip(circle(screen, color, (int(x + 25), int(y)), 35))
+        rect.union_ip(circle(screen, color, (int(x + 50), int(y)), 30))
+        rects.append(rect)
+    return rects
+
+
+def draw_chickens(screen, world, rows):
+    rects = []
+    frame = world.phase[rows]
+    body_x = world.position[rows, 0].astype(int)
+    body_y = (world.position[rows, 1] + np.sin(frame * 0.2) * 2).astype(int)
+    wing_offset = np.sin(frame * 0.4) * 2
+    beak_dir = np.where(world.velocity[rows, 0] > 0, 1, -1)
+    step = (frame.astype(int) // 10) % 2
+    for body_x, body_y, wing_offset, beak_dir, step in zip(body_x.tolist(), body_y.tolist(), wing_offset.tolist(),
+                                                           beak_dir.tolist(), step.tolist()):
         # Body (rounded oval)
         pygame.draw.ellipse(screen, (250, 240, 200), (body_x, body_y, 20, 12))
         # Wing (animation flap)
-        wing_offset = math.sin(self.frame * 0.4) * 2
         pygame.draw.ellipse(screen, (240, 220, 180), (body_x + 5, body_y + 3 + wing_offset, 10, 6))
 
         # Head
-        head_x = body_x + (18 if self.direction > 0 else -8)
-        pygame.draw.circle(screen, (255, 255, 230), (int(head_x), int(body_y + 2)), 6)
+        head_x = body_x + (18 if beak_dir > 0 else -8)
+        pygame.draw.circle(screen, (255, 255, 230), (head_x, body_y + 2), 6)
 
         # Beak
-        beak_dir = 1 if self.direction > 0 else -1
         pygame.draw.polygon(screen, (255, 165, 0), [
             (head_x + 5 * beak_dir, body_y + 2),
             (head_x + 9 * beak_dir, body_y + 1),
@@ -866,66 +1672,126 @@ class PixelChicken:
         ])
 
         # Eye
-        pygame.draw.circle(screen, BLACK, (int(head_x + 2 * beak_dir), int(body_y + 1)), 1)
+        pygame.draw.circle(screen, BLACK, (head_x + 2 * beak_dir, body_y + 1), 1)
 
         # Legs (motion alternating)
         leg_y = body_y + 12
-        step_cycle = (self.frame // 10) % 2
-        leg_offset = 1 if step_cycle == 0 else -1
+        leg_offset = 1 if step == 0 else -1
         pygame.draw.line(screen, (180, 120, 0), (body_x + 6, leg_y), (body_x + 6, leg_y + 5 + leg_offset), 2)
         pygame.draw.line(screen, (180, 120, 0), (body_x + 14, leg_y), (body_x + 14, leg_y + 5 - leg_offset), 2)
 
+        # Head, beak and legs in either direction
+        rects.append(pygame.Rect(body_x - 18, body_y - 5, 47, 25))
+    return rects
 
-class Candy:
-    """Bright wrapped candies floating gently in background."""
-    def __init__(self, x, y, drift):
-        self.x = x
-        self.y = y
-        self.drift = drift
-        self.color = random.choice([
-            (255, 100, 150),
-            (255, 160, 100),
-            (230, 100, 255),
-            (150, 200, 255),
-            (120, 255, 150)
-        ])
-        self.spin = random.uniform(0, 2 * math.pi)
-        self.spin_speed = random.uniform(0.01, 0.03)
-        self.float_phase = random.uniform(0, 2 * math.pi)
-
-    def update(self):
-        self.spin += self.spin_speed
-        self.y += math.sin(pygame.time.get_ticks() * 0.002 + self.float_phase) * 0.2
-        self.x += self.drift
-        if self.x > SCREEN_WIDTH + 30: self.x = -30
-        if self.x < -30: self.x = SCREEN_WIDTH + 30
-
-    def draw(self, screen):
-        cx, cy = int(self.x), int(self.y)
-        angle = self.spin
-        cos_a, sin_a = math.cos(angle), math.sin(angle)
 
+def draw_candies(screen, world, rows):
+    rects = []
+    centers = world.position[rows].astype(int)
+    spin = world.phase[rows]
+    # Wrapper tips at twice the wrapper length along the spin
+    tips = np.stack([np.cos(spin), np.sin(spin)], axis=1) * 12
+    shine = int(pygame.time.get_ticks() / 200) % 2 == 0
+    for (cx, cy), (tip_x, tip_y), color in zip(centers.tolist(), tips.tolist(), world.color[rows].tolist()):
         # Candy body (rotating ellipse)
         for i in range(2):  # create subtle 3D shade
             width = 10 - i
             height = 6 - i
-            pygame.draw.ellipse(screen, self.color, (cx - width, cy - height, width * 2, height * 2))
+            pygame.draw.ellipse(screen, color, (cx - width, cy - height, width * 2, height * 2))
 
         # Wrappers (triangle-like wings)
-        wrapper_length = 6
-        left_tip = (cx - cos_a * wrapper_length * 2, cy - sin_a * wrapper_length * 2)
-        right_tip = (cx + cos_a * wrapper_length * 2, cy + sin_a * wrapper_length * 2)
         pygame.draw.polygon(screen, (255, 255, 255, 180), [
-            (cx, cy - 3), left_tip, (cx, cy + 3)
+            (cx, cy - 3), (cx - tip_x, cy - tip_y), (cx, cy + 3)
         ])
         pygame.draw.polygon(screen, (255, 255, 255, 180), [
-            (cx, cy - 3), right_tip, (cx, cy + 3)
+            (cx, cy - 3), (cx + tip_x, cy + tip_y), (cx, cy + 3)
         ])
 
         # Wrapper shine
-        if int(pygame.time.get_ticks() / 200) % 2 == 0:
+        if shine:
             pygame.draw.line(screen, WHITE, (cx - 3, cy - 1), (cx + 3, cy - 1), 1)
 
+        # Body plus the wrappers at any spin
+        rects.append(pygame.Rect(cx - 13, cy - 13, 27, 27))
+    return rects
+
+
+# Batch draw function per decoration kind, in drawing order
+DECORATION_RENDERERS = {
+    DECORATION_STAR: draw_stars,
+    DECORATION_CANDY: draw_candies,
+    DECORATION_CHICKEN: draw_chickens,
+    DECORATION_CLOUD: draw_clouds,
+}
+
+# Arena entity kind and collider layer of health pickups, see Match.update_arena
+PICKUP_HEALTH = 4
+PICKUP_LAYER = 1
+
+
+def draw_pickups(screen, arena):
+    """Draw the match's health pickups and return the Rects drawn to."""
+    rects = []
+    rows = arena.of_kind(PICKUP_HEALTH)
+    # Blink through the last second and a half before vanishing
+    hidden = (arena.expires[rows] - arena.ticks < 90) & ((arena.ticks - arena.born[rows]) // 8 % 2 == 1)
+    for (x, y), (width, height), hidden in zip(arena.position[rows].astype(int).tolist(),
+                                               arena.size[rows].astype(int).tolist(), hidden.tolist()):
+        if hidden:
+            continue
+        rect = pygame.draw.rect(screen, WHITE, (x, y, width, height), border_radius=5)
+        pygame.draw.rect(screen, RED, (x + width // 2 - 3, y + 4, 6, height - 8))
+        pygame.draw.rect(screen, RED, (x + 4, y + height // 2 - 3, width - 8, 6))
+        rects.append(rect)
+    return rects
+
+
+class TextCache:
+    """Font registry plus an LRU cache of rendered text Surfaces.
+
+    Fonts are loaded once per size and rendered strings are keyed by
+    (text, size, color, antialias), so unchanged HUD text is just a blit.
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = pygame.font.Font(None, size)
+            self.fonts[size] = font
+        return font
+
+    def render(self, text, size, color, antialias=True):
+        key = (text, size, color, antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = self.font(size).render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+text_cache = TextCache()
+
+
 def draw_health_bar(screen, x, y, health, max_health, name):
     pygame.draw.rect(screen, BLACK, (x - 2, y - 2, 204, 24))
     pygame.draw.rect(screen, DARK_RED, (x, y, 200, 20))
@@ -940,29 +1806,33 @@ def draw_health_bar(screen, x, y, health, max_health, name):
     pygame.draw.rect(screen, color, (x, y, health_width, 20))
     pygame.draw.rect(screen, BLACK, (x, y, 200, 20), 2)
     
-    font = pygame.font.Font(None, 24)
-    text = font.render(f"{name}: {int(health)}/{max_health}", True, WHITE)
-    screen.blit(text, (x + 5, y + 2))
+    text = text_cache.render(f"{name}: {int(health)}/{max_health}", 24, WHITE)
+    return screen.blit(text, (x + 5, y + 2)).union((x - 2, y - 2, 204, 24))
+
+
+def controls_help(label, controls):
+    """Return the HUD line listing one keyboard slot's bindings."""
+    name = pygame.key.name
+    move = ''.join(name(controls[d]) for d in ('up', 'left', 'down', 'right')).upper()
+    skills = '/'.join(name(key) for key in controls['abilities'])
+    return f"{label}: {move}=Move, {skills}=Skills, {name(controls['hypercharge'])}=HYPERCHARGE"
+
+
+CONTROLS_HELP = tuple(controls_help(f"P{i + 1}", controls) for i, controls in enumerate(FIGHTER_CONTROLS))
 
 
 def draw_cooldown_indicators(screen, character, x, y):
-    font = pygame.font.Font(None, 20)
-    
-    if isinstance(character, Telesheepy):
-        abilities = [
-            ('1: Lightning', character.ability_cooldowns['1'], 40),
-            ('2: Storm', character.ability_cooldowns['2'], 80),
-            ('3: Wave', character.ability_cooldowns['3'], 60),
-            ('4: HYPERCHARGE', character.hypercharge_cooldown, 900)
-        ]
-    else:
-        abilities = [
-            ('7: Rocket', character.ability_cooldowns['7'], 40),
-            ('8: Barrage', character.ability_cooldowns['8'], 80),
-            ('9: Homing', character.ability_cooldowns['9'], 100),
-            ('0: HYPERCHARGE', character.hypercharge_cooldown, 900)
-        ]
+    table = character.abilities
+    keys = character.ability_keys
+    abilities = [
+        (f"{pygame.key.name(key)}: {label}", cooldown, max_cooldown)
+        for key, label, cooldown, max_cooldown in zip(keys, table.labels, character.ability_cooldowns,
+                                                       table.cooldowns)
+    ]
+    abilities.append((f"{pygame.key.name(character.hypercharge_key)}: HYPERCHARGE", character.hypercharge_cooldown,
+                      table.cooldown))
     
+    rect = pygame.Rect(x - 1, y - 1, 0, 0)
     for i, (name, cooldown, max_cooldown) in enumerate(abilities):
         y_pos = y + i * 25
         bar_width = 100
@@ -986,97 +1856,1150 @@ def draw_cooldown_indicators(screen, character, x, y):
         pygame.draw.rect(screen, BLACK, (x, y_pos, bar_width, 10), 1)
         
         text_color = GOLD if is_hypercharge else WHITE
-        text = font.render(name, True, text_color)
-        screen.blit(text, (x + bar_width + 5, y_pos - 2))
-
-
-def draw_background(screen, clouds, stars, chickens, candies):
-    # Sky gradient
-    for i in range(GROUND):
-        progress = i / GROUND
-        r = int(135 - 100 * progress)
-        g = int(206 - 50 * progress)
-        b = int(235 - 20 * progress)
-        pygame.draw.line(screen, (r, g, b), (0, i), (SCREEN_WIDTH, i))
-
-    # Stars
-    for star in stars:
-        star.update()
-        star.draw(screen)
-
-    # Mountains
-    mountain_points = [
-        (0, GROUND),
-        (200, GROUND - 150),
-        (400, GROUND - 100),
-        (600, GROUND - 180),
-        (800, GROUND - 120),
-        (SCREEN_WIDTH, GROUND - 80),
-        (SCREEN_WIDTH, GROUND)
-    ]
-    pygame.draw.polygon(screen, (60, 80, 100), mountain_points)
-    pygame.draw.polygon(screen, (40, 60, 80), mountain_points, 3)
+        text = text_cache.render(name, 20, text_color)
+        rect.union_ip(screen.blit(text, (x + bar_width + 5, y_pos - 2)))
+        rect.union_ip((x - 1, y_pos - 1, bar_width + 2, 12))
+    return rect
+
+
+class BackgroundLayers:
+    """Static background layers baked once into Surfaces.
+
+    The sky (gradient and mountains) and the ground are rendered on first use
+    and only rebuilt when the target resolution changes, so a frame costs two
+    blits plus the animated stars, candies, chickens and clouds.
+    """
+    def __init__(self, rng=random):
+        self.rng = rng
+        self.size = None
+        self.sky = None
+        self.ground = None
+        self.ground_top = 0
+        self.mountain_pixels = None
+
+    def invalidate(self):
+        self.size = None
+
+    def ensure(self, size):
+        if size != self.size:
+            self.bake(size)
+
+    def bake(self, size):
+        width, height = size
+        ground = height - 100
+
+        # Sky gradient
+        self.sky = pygame.Surface(size)
+        for i in range(ground):
+            progress = i / ground
+            r = int(135 - 100 * progress)
+            g = int(206 - 50 * progress)
+            b = int(235 - 20 * progress)
+            pygame.draw.line(self.sky, (r, g, b), (0, i), (width, i))
+
+        # Mountains, plus a mask so stars behind them can be skipped
+        mountain_points = [
+            (0, ground),
+            (200, ground - 150),
+            (400, ground - 100),
+            (600, ground - 180),
+            (800, ground - 120),
+            (width, ground - 80),
+            (width, ground)
+        ]
+        mountains = pygame.Surface(size, pygame.SRCALPHA)
+        pygame.draw.polygon(mountains, (60, 80, 100), mountain_points)
+        pygame.draw.polygon(mountains, (40, 60, 80), mountain_points, 3)
+        self.mountain_pixels = pygame.surfarray.array_alpha(mountains) > 127
+        self.sky.blit(mountains, (0, 0))
+
+        # Ground, with grass heights rolled once instead of every frame
+        self.ground_top = ground - 8
+        self.ground = pygame.Surface((width, height - self.ground_top), pygame.SRCALPHA)
+        top = ground - self.ground_top
+        pygame.draw.rect(self.ground, (34, 139, 34), (0, top, width, height - ground))
+        for i in range(0, width, 20):
+            grass_height = self.rng.randint(3, 8)
+            pygame.draw.line(self.ground, (20, 120, 20), (i, top), (i, top - grass_height), 2)
+        pygame.draw.rect(self.ground, (20, 100, 20), (0, top, width, 5))
+
+        self.size = size
+
+    def visible(self, points):
+        """Return which of the (x, y) rows of ``points`` are not behind the mountains."""
+        x, y = points.astype(int).T
+        width, height = self.size
+        inside = (0 <= x) & (x < width) & (0 <= y) & (y < height)
+        hidden = np.zeros(len(x), bool)
+        hidden[inside] = self.mountain_pixels[x[inside], y[inside]]
+        return ~hidden
+
+
+background_layers = BackgroundLayers()
 
-    # 🎨 Candies and Chickens before clouds
-    for candy in candies:
-        candy.update()
-        candy.draw(screen)
 
-    for chicken in chickens:
-        chicken.update()
-        chicken.draw(screen)
+def update_scenery(scenery):
+    """Advance the background decorations by one simulation tick."""
+    scenery.update(pygame.time.get_ticks())
 
-    # Clouds
-    for cloud in clouds:
-        cloud.update()
-        cloud.draw(screen)
+
+def draw_background(screen, scenery):
+    background_layers.ensure(screen.get_size())
+
+    # Sky gradient and mountains
+    screen.blit(background_layers.sky, (0, 0))
+
+    draw_scenery(screen, scenery)
 
     # Ground
-    pygame.draw.rect(screen, (34, 139, 34), (0, GROUND, SCREEN_WIDTH, SCREEN_HEIGHT - GROUND))
-    for i in range(0, SCREEN_WIDTH, 20):
-        grass_height = random.randint(3, 8)
-        pygame.draw.line(screen, (20, 120, 20), (i, GROUND), (i, GROUND - grass_height), 2)
-    pygame.draw.rect(screen, (20, 100, 20), (0, GROUND, SCREEN_WIDTH, 5))
+    screen.blit(background_layers.ground, (0, background_layers.ground_top))
+
+
+def draw_scenery(screen, scenery):
+    """Draw the animated decorations over the sky and return the Rects drawn to."""
+    rects = []
+
+    # Lower quality draws only the first part of each kind
+    density = quality.scenery
+
+    # 🎨 Stars, then candies and chickens before clouds
+    for kind, draw in DECORATION_RENDERERS.items():
+        rows = scenery.of_kind(kind)
+        rects += draw(screen, scenery, rows[:int(len(rows) * density)])
+    return rects
+
+
+class FrameBuffers:
+    """Back-buffer and game-over overlay reused from frame to frame.
+
+    Both are allocated on first use and again only when the requested size
+    changes, so steady-state rendering allocates no Surfaces.
+    """
+    def __init__(self):
+        self.back = None
+        self.dim = None
+
+    def back_buffer(self, size):
+        if self.back is None or self.back.get_size() != size:
+            self.back = pygame.Surface(size)
+        return self.back
+
+    def overlay(self, size):
+        if self.dim is None or self.dim.get_size() != size:
+            self.dim = pygame.Surface(size)
+            self.dim.set_alpha(128)
+            self.dim.fill(BLACK)
+        return self.dim
+
+
+frame_buffers = FrameBuffers()
+
+
+class Quality:
+    """Visual detail settings read by the draw and particle code.
+
+    Only cosmetics look at these (and only the cosmetic random streams are
+    drawn from at different rates), so every level plays out identically.
+    """
+    # Particle spawn scale, lightning glow, lightning branches, rocket trail points, scenery fraction
+    LEVELS = (
+        (0.25, False, False, 3, 0.25),
+        (0.5, False, True, 5, 0.5),
+        (0.75, True, True, 8, 0.75),
+        (1.0, True, True, 10, 1.0),
+    )
+
+    def __init__(self):
+        self.set_level(len(self.LEVELS) - 1)
+
+    def set_level(self, level):
+        self.level = level
+        self.particles, self.glow, self.branches, self.trail_length, self.scenery = self.LEVELS[level]
+
+
+quality = Quality()
+
+
+class QualityGovernor:
+    """Moves ``quality`` down a level when frames run over budget and back up when there is room.
+
+    ``update`` takes each frame's working time in seconds (excluding the
+    frame cap's sleep). A level is dropped when the average over ``window``
+    frames exceeds ``budget``, and only raised again after ``recover``
+    frames in a row averaging under ``headroom`` of the budget. Nothing
+    changes for ``hold`` frames after a switch, so the level cannot flap.
+    """
+    def __init__(self, budget, quality, window=30, headroom=0.6, recover=180, hold=60):
+        self.budget = budget
+        self.quality = quality
+        self.times = deque(maxlen=window)
+        self.headroom = headroom
+        self.recover = recover
+        self.hold = hold
+        self.hold_left = hold
+        self.calm = 0
+
+    def update(self, frame_time):
+        times = self.times
+        times.append(frame_time)
+        if self.hold_left > 0:
+            self.hold_left -= 1
+            return
+        if len(times) < times.maxlen:
+            return
+
+        average = sum(times) / len(times)
+        level = self.quality.level
+        if average > self.budget:
+            self.calm = 0
+            if level > 0:
+                self.switch(level - 1)
+        elif average < self.budget * self.headroom:
+            self.calm += 1
+            if self.calm >= self.recover and level < len(self.quality.LEVELS) - 1:
+                self.switch(level + 1)
+        else:
+            self.calm = 0
+
+    def switch(self, level):
+        self.quality.set_level(level)
+        self.times.clear()
+        self.hold_left = self.hold
+        self.calm = 0
+
+
+class FrameProfiler:
+    """Per-phase frame timings with an on-screen overlay and CSV export.
+
+    Call ``start_frame``, then ``mark(phase)`` as each phase of the loop ends
+    and ``end_frame`` once the frame is presented. The last ``window`` frames
+    are kept for the overlay's rolling percentiles; every frame is kept for
+    export when ``keep_all`` is set.
+    """
+    # 'sim' is the tick loop outside Match.step: scenery, bots and replay recording
+    PHASES = ('input', 'sim', 'move', 'use_ability', 'update_projectiles', 'collision',
+              'draw_background', 'characters', 'hud', 'present')
+    COLUMNS = ('frame_ms',) + tuple(f'{phase}_ms' for phase in PHASES) + (
+        'particles', 'projectiles', 'alloc_blocks', 'gc_collections')
+
+    def __init__(self, window=600, keep_all=False):
+        self.visible = False
+        self.window = deque(maxlen=window)
+        self.frames = [] if keep_all else None
+        self.timings = dict.fromkeys(self.PHASES, 0.0)
+        self.frame_start = self.last = time.perf_counter()
+        self.blocks = sys.getallocatedblocks()
+        self.collections = self.gc_collections()
+        self.panel = None
+        self.panel_age = 0
+
+    @staticmethod
+    def gc_collections():
+        return sum(stats['collections'] for stats in gc.get_stats())
+
+    def start_frame(self):
+        self.frame_start = self.last = time.perf_counter()
+        for phase in self.timings:
+            self.timings[phase] = 0.0
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.timings[phase] += now - self.last
+        self.last = now
+
+    def end_frame(self, match):
+        now = time.perf_counter()
+        blocks = sys.getallocatedblocks()
+        collections = self.gc_collections()
+        players = match.players
+        row = ((now - self.frame_start) * 1000,) + tuple(t * 1000 for t in self.timings.values()) + (
+            sum(player.particle_count() for player in players),
+            sum(len(player.projectiles) for player in players),
+            blocks - self.blocks,
+            collections - self.collections,
+        )
+        self.blocks = blocks
+        self.collections = collections
+        self.window.append(row)
+        if self.frames is not None:
+            self.frames.append(row)
+
+    def percentiles(self):
+        """Return rolling (p50, p95, p99) frame times in milliseconds."""
+        if not self.window:
+            return 0.0, 0.0, 0.0
+        times = np.fromiter((row[0] for row in self.window), float, len(self.window))
+        return tuple(np.percentile(times, (50, 95, 99)))
+
+    def export_csv(self, path):
+        rows = self.frames if self.frames is not None else self.window
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.COLUMNS)
+            writer.writerows(rows)
 
-def main():
-    # Initialize background elements HERE inside main()
-    clouds = [Cloud(random.randint(0, SCREEN_WIDTH), random.randint(50, 150), random.uniform(0.2, 0.5)) for _ in range(5)]
-    stars = [Star(random.randint(0, SCREEN_WIDTH), random.randint(0, GROUND - 100)) for _ in range(50)]
-    # Add pixel chickens and candies
+    def draw(self, screen):
+        if not self.visible or not self.window:
+            return None
+        # Numbers change every frame, so re-render the panel twice a second
+        # rather than churning the shared text cache
+        self.panel_age -= 1
+        if self.panel is None or self.panel_age <= 0:
+            self.panel = self.render_panel()
+            self.panel_age = 30
+        return screen.blit(self.panel, (SCREEN_WIDTH // 2 - self.panel.get_width() // 2, 20))
+
+    def render_panel(self):
+        font = text_cache.font(18)
+        count = len(self.window)
+        averages = [sum(row[i] for row in self.window) / count for i in range(len(self.COLUMNS))]
+        p50, p95, p99 = self.percentiles()
+        lines = [f"frame p50 {p50:.2f}  p95 {p95:.2f}  p99 {p99:.2f} ms"]
+        lines += [f"{phase:<20}{averages[i + 1]:6.2f} ms" for i, phase in enumerate(self.PHASES)]
+        latest = self.window[-1]
+        lines.append(f"particles {latest[-4]}  projectiles {latest[-3]}")
+        lines.append(f"alloc blocks {averages[-2]:+.0f}/frame  gc {sum(row[-1] for row in self.window)}")
+        lines.append(f"quality level {quality.level}/{len(quality.LEVELS) - 1}")
+
+        line_height = font.get_linesize()
+        panel = pygame.Surface((260, line_height * len(lines) + 10))
+        panel.set_alpha(200)
+        for i, line in enumerate(lines):
+            panel.blit(font.render(line, True, GREEN), (5, 5 + i * line_height))
+        return panel
+
+
+def hud_state(match):
+    """Return everything the HUD shows, so an unchanged HUD need not be redrawn."""
+    players = match.players
+    # The ready hypercharge bar pulses five times a second
+    pulse = any(player.hypercharge_cooldown == 0 for player in players) and int(pygame.time.get_ticks() / 200) % 2
+    return (match.game_over, match.winner, pulse) + tuple(
+        (player.health, player.hypercharge_cooldown, *player.ability_cooldowns) for player in players)
+
+
+def draw_hud(screen, match):
+    """Draw health bars, cooldowns and help text; returns the Rects drawn to."""
+    player1 = match.player1
+    player2 = match.player2
+
+    if len(match.players) == 2:
+        rects = [
+            draw_health_bar(screen, 20, 20, player1.health, player1.max_health, player1.name),
+            draw_health_bar(screen, SCREEN_WIDTH - 220, 20, player2.health, player2.max_health, player2.name),
+            draw_cooldown_indicators(screen, player1, 20, 60),
+            draw_cooldown_indicators(screen, player2, SCREEN_WIDTH - 220, 60),
+        ]
+    else:
+        # Health bars four to a row; only the two keyboard players get cooldowns, along the bottom
+        teamed = len(match.team_ids) < len(match.players)
+        rects = []
+        for i, player in enumerate(match.players):
+            name = f"{player.name} T{player.team}" if teamed else player.name
+            rects.append(draw_health_bar(screen, 20 + i % 4 * 245, 20 + i // 4 * 30,
+                                         player.health, player.max_health, name))
+        rects.append(draw_cooldown_indicators(screen, player1, 20, SCREEN_HEIGHT - 105))
+        rects.append(draw_cooldown_indicators(screen, player2, SCREEN_WIDTH - 220, SCREEN_HEIGHT - 105))
+
+    help_text1 = text_cache.render(CONTROLS_HELP[0], 18, WHITE)
+    help_text2 = text_cache.render(CONTROLS_HELP[1], 18, WHITE)
+
+    rects.append(pygame.draw.rect(screen, BLACK, (SCREEN_WIDTH // 2 - 180, SCREEN_HEIGHT - 50, 360, 45)))
+    screen.blit(help_text1, (SCREEN_WIDTH // 2 - 170, SCREEN_HEIGHT - 45))
+    screen.blit(help_text2, (SCREEN_WIDTH // 2 - 170, SCREEN_HEIGHT - 25))
+
+    if match.game_over:
+        rects.append(screen.blit(frame_buffers.overlay(screen.get_size()), (0, 0)))
+
+        winner_text = text_cache.render(f"{match.winner} WINS!", 72, GOLD)
+        text_rect = winner_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
+        screen.blit(winner_text, text_rect)
+
+        restart_text = text_cache.render("Press R to Restart or ESC to Quit", 36, WHITE)
+        restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 50))
+        screen.blit(restart_text, restart_rect)
+    return rects
+
+
+def merge_rects(rects):
+    """Union overlapping Rects until none overlap, skipping empty ones."""
+    merged = []
+    for rect in rects:
+        if not rect:
+            continue
+        rect = pygame.Rect(rect)
+        i = rect.collidelist(merged)
+        while i != -1:
+            rect.union_ip(merged.pop(i))
+            i = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+class DirtyRenderer:
+    """Redraws and presents only the parts of the screen that changed.
+
+    Draw calls report the Rects they touched. Each frame the regions drawn
+    last frame are restored from the baked sky, the scene is drawn again with
+    the ground re-laid over anything restored or drawn behind it, and only
+    the old and new regions are copied to the display and passed to
+    ``pygame.display.update``. The HUD lives on its own layer, re-rendered
+    only when ``hud_state`` changes and composited over each updated region.
+
+    It assumes it owns the back-buffer between frames; call ``invalidate``
+    after anything else draws to it or to the display.
+    """
+    def __init__(self):
+        self.drawn = []
+        self.hud = None
+        self.hud_key = None
+        self.hud_rects = []
+        self.stale = True
+
+    def invalidate(self):
+        self.stale = True
+
+    def render(self, screen, back, match, scenery, alpha, profiler, poll=None):
+        """Draw a frame into ``back``, present the changed regions and return them.
+
+        ``poll``, when given, is called between draw stages to hand over input.
+        """
+        size = back.get_size()
+        background_layers.ensure(size)
+        sky = background_layers.sky
+        ground = background_layers.ground
+        ground_area = ground.get_rect(top=background_layers.ground_top)
+        restore = [back.get_rect()] if self.stale else self.drawn
+
+        # Scene: sky under everything drawn last frame, then decorations and ground
+        back.blits([(sky, rect, rect) for rect in restore], doreturn=False)
+        drawn = [rect for rect in draw_scenery(back, scenery) if rect]
+        for rect in restore + drawn:
+            rect = rect.clip(ground_area)
+            if rect:
+                back.blit(ground, rect, rect.move(0, -ground_area.top))
+        profiler.mark('draw_background')
+        if poll:
+            poll()
+
+        drawn += draw_pickups(back, match.arena)
+        for player in match.players:
+            drawn += [rect for rect in player.draw(back, alpha) if rect]
+            if poll:
+                poll()
+        profiler.mark('characters')
+
+        panel = profiler.draw(back)
+        if panel:
+            drawn.append(panel)
+        updates = restore + drawn
+        key = hud_state(match)
+        if self.stale or key != self.hud_key:
+            if self.hud is None or self.hud.get_size() != size:
+                self.hud = pygame.Surface(size, pygame.SRCALPHA)
+            self.hud.fill((0, 0, 0, 0))
+            rects = draw_hud(self.hud, match)
+            updates += self.hud_rects + rects
+            self.hud_key = key
+            self.hud_rects = rects
+        profiler.mark('hud')
+        if poll:
+            poll()
+
+        # Regions must not overlap or the HUD would be blended twice
+        updates = merge_rects(rect.clip(back.get_rect()) for rect in updates)
+        screen.blits([(back, rect, rect) for rect in updates], doreturn=False)
+        screen.blits([(self.hud, rect, rect) for rect in updates], doreturn=False)
+        pygame.display.update(updates)
+        self.drawn = drawn
+        self.stale = False
+        return updates
+
+
+class KeyState(frozenset):
+    """Set of held key codes, usable wherever pygame.key.get_pressed() is."""
+    def __getitem__(self, key):
+        return key in self
+
+
+NO_KEYS = KeyState()
+
+
+class SpatialHash:
+    """Uniform-grid broadphase over the arena.
+
+    Entries are (index, item, owner, left, top, right, bottom) tuples kept in
+    per-cell lists that are emptied, not reallocated, by ``clear``. Owners
+    carry a ``team``. Queries return overlapping items in insertion order,
+    each once.
+    """
+    def __init__(self, width=SCREEN_WIDTH, height=SCREEN_HEIGHT, cell_size=100, margin=100):
+        self.cell_size = cell_size
+        self.margin = margin
+        self.cols = (width + 2 * margin) // cell_size + 1
+        self.rows = (height + 2 * margin) // cell_size + 1
+        self.cells = [[] for _ in range(self.cols * self.rows)]
+        self.used = []
+        self.count = 0
+        self.found = {}
+
+    def clear(self):
+        cells = self.cells
+        for i in self.used:
+            cells[i].clear()
+        self.used.clear()
+        self.count = 0
+
+    def cell_range(self, left, top, right, bottom):
+        size = self.cell_size
+        margin = self.margin
+        last_col = self.cols - 1
+        last_row = self.rows - 1
+        col0 = (left + margin) // size
+        col1 = (right + margin) // size
+        row0 = (top + margin) // size
+        row1 = (bottom + margin) // size
+        # Anything beyond the margin lands in the border cells
+        if col0 < 0 or col1 > last_col:
+            col0 = min(max(col0, 0), last_col)
+            col1 = min(max(col1, 0), last_col)
+        if row0 < 0 or row1 > last_row:
+            row0 = min(max(row0, 0), last_row)
+            row1 = min(max(row1, 0), last_row)
+        return col0, row0, col1, row1
+
+    def insert(self, item, owner, left, top, right, bottom):
+        entry = (self.count, item, owner, left, top, right, bottom)
+        self.count += 1
+        cells = self.cells
+        col0, row0, col1, row1 = self.cell_range(left, top, right, bottom)
+        for row in range(row0, row1 + 1):
+            base = row * self.cols
+            for col in range(col0, col1 + 1):
+                cell = cells[base + col]
+                if not cell:
+                    self.used.append(base + col)
+                cell.append(entry)
+
+    def query(self, left, top, right, bottom, exclude_team=None):
+        """Return active items overlapping the box, skipping those whose owner is on ``exclude_team``."""
+        found = self.found
+        found.clear()
+        cells = self.cells
+        col0, row0, col1, row1 = self.cell_range(left, top, right, bottom)
+        for row in range(row0, row1 + 1):
+            base = row * self.cols
+            for col in range(col0, col1 + 1):
+                for entry in cells[base + col]:
+                    if (entry[2].team != exclude_team and entry[1].active
+                            and entry[3] < right and left < entry[5]
+                            and entry[4] < bottom and top < entry[6]):
+                        found[entry[0]] = entry
+        if len(found) > 1:
+            return [found[i] for i in sorted(found)]
+        return list(found.values())
+
+
+class EnemyIndex:
+    """Nearest-enemy queries over a match's fighters.
+
+    Call ``moved`` after fighters move and ``rebuild`` after one is knocked
+    out or the match is restored. The first batch query after either copies
+    the centres into one array, and each query measures a whole projectile
+    pool against the living enemies in one numpy operation instead of
+    scanning every fighter per projectile.
+    """
+    def __init__(self, players):
+        self.players = players
+        self.teams = np.array([player.team for player in players])
+        self.centers = np.zeros((len(players), 2))
+        self.living = np.ones(len(players), bool)
+        self.stale = True
+        # Living enemies per team, filled in on demand
+        self.by_team = {}
+
+    def moved(self):
+        self.stale = True
+
+    def rebuild(self):
+        self.stale = True
+        self.by_team.clear()
+
+    def enemies(self, team):
+        """Return the living fighters not on ``team``."""
+        enemies = self.by_team.get(team)
+        if enemies is None:
+            enemies = self.by_team[team] = [player for player in self.players
+                                            if player.health > 0 and player.team != team]
+        return enemies
+
+    def nearest(self, player):
+        """Return the living enemy whose centre is nearest to ``player``'s, or None."""
+        enemies = self.enemies(player.team)
+        if len(enemies) < 2:
+            return enemies[0] if enemies else None
+        x = player.x + player.width / 2
+        y = player.y + player.height / 2
+        return min(enemies, key=lambda enemy: (enemy.x + enemy.width / 2 - x) ** 2
+                   + (enemy.y + enemy.height / 2 - y) ** 2)
+
+    def nearest_centers(self, team, points):
+        """Return the centre of the nearest living enemy of ``team`` for each (x, y) row of ``points``."""
+        if self.stale:
+            players = self.players
+            self.centers[:] = [(player.x + player.width / 2, player.y + player.height / 2) for player in players]
+            self.living[:] = [player.health > 0 for player in players]
+            self.stale = False
+        candidates = np.flatnonzero(self.living & (self.teams != team))
+        centers = self.centers[candidates]
+        distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        return centers[distances.argmin(axis=1)]
+
+
+class GameRandom(random.Random):
+    """``random.Random`` that counts its draws.
+
+    Gameplay draws are rare, so Match snapshots reuse the packed generator
+    state until ``draws`` changes instead of re-packing all 625 words.
+    """
+    draws = 0
+
+    def random(self):
+        self.draws += 1
+        return super().random()
+
+    def getrandbits(self, k):
+        self.draws += 1
+        return super().getrandbits(k)
+
+    def setstate(self, state):
+        self.draws += 1
+        super().setstate(state)
+
+
+class Match:
+    """Game state and rules for one fight, Telesheepy vs Rocket Hair unless another roster is given.
+
+    ``roster`` names up to ``MAX_FIGHTERS`` character classes and ``teams``
+    gives each fighter's team; by default every fighter is on its own team,
+    a free-for-all. Fighters only hurt other teams, and the last team with a
+    fighter standing wins. ``player1`` and ``player2`` are the first two
+    entries of ``players``.
+
+    Advances one tick per ``step`` from each player's key state and never
+    touches the display, so it can run headless for bots, tests and batch
+    simulation. Pass ``visuals=False`` to skip cosmetic particles entirely.
+
+    All gameplay randomness comes from ``rng``, seeded from ``seed``; cosmetic
+    effects draw from a separate ``fx_rng`` stream, so the same seed and
+    inputs give the same fight no matter how often it is rendered.
+
+    Health pickups are entities of the ``arena`` World, each with a lifetime
+    and a collider.
+
+    ``snapshot`` packs the state into one flat buffer: this header and the
+    projectile count of each fighter, the gameplay RNG, the fighters, their
+    live projectiles and the arena, then the projectiles' cosmetic fields.
+    ``state_hash`` covers everything up to the cosmetic tail, so it only
+    changes when gameplay does.
+    """
+    # Gameplay size, tick, game over, winner (0 none, else 1 + the team's position in team_ids)
+    STATE = struct.Struct('<II?B')
+    # Mersenne Twister words and position, then the cached gauss value if any
+    RNG_STATE = struct.Struct('<625I?d')
+
+    def __init__(self, seed=None, visuals=True, roster=DEFAULT_ROSTER, teams=None):
+        if not 2 <= len(roster) <= MAX_FIGHTERS:
+            raise ValueError(f"a match needs 2 to {MAX_FIGHTERS} fighters, got {len(roster)}")
+        unknown = [name for name in roster if name not in CHARACTERS]
+        if unknown:
+            raise ValueError(f"unknown characters {', '.join(unknown)}; choose from {', '.join(CHARACTERS)}")
+        if teams is None:
+            teams = range(len(roster))
+        teams = tuple(teams)
+        if len(teams) != len(roster) or len(set(teams)) < 2:
+            raise ValueError("teams needs one entry per fighter and at least two different teams")
+        self.roster = tuple(roster)
+        self.teams = teams
+        # Teams in order of first appearance
+        self.team_ids = tuple(dict.fromkeys(teams))
+        self.COUNTS = struct.Struct(f'<{len(roster)}H')
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.visuals = visuals
+        # Optional FrameProfiler that step() reports its phases to
+        self.profiler = None
+        self.reset()
+
+    def reset(self):
+        self.rng = GameRandom(self.seed)
+        # Packed rng state and the draw count it was packed at, see snapshot()
+        self.rng_state = None
+        self.rng_draws = -1
+        self.fx_rng = random.Random(f"fx-{self.seed}")
+        count = len(self.roster)
+        repeated = len(set(self.roster)) < count
+        self.players = []
+        for i, (name, team) in enumerate(zip(self.roster, self.teams)):
+            # Spread out along the ground, first and last at the classic spots
+            x = 100 + (SCREEN_WIDTH - 250) * i // (count - 1)
+            player = CHARACTERS[name](x, GROUND - 80, FIGHTER_CONTROLS[i % 2], self.rng, self.fx_rng)
+            player.team = team
+            if repeated:
+                player.name = f"{player.name} {i + 1}"
+            if not self.visuals:
+                player.set_particles_enabled(False)
+            self.players.append(player)
+        self.player1, self.player2 = self.players[:2]
+        self.grid = SpatialHash()
+        self.arena = World(capacity=4, rng=self.rng)
+        self.enemies = EnemyIndex(self.players)
+        self.enemies.rebuild()
+        self.tick = 0
+        self.game_over = False
+        self.winner = None
+        self.winning_team = None
+
+    @property
+    def hypercharge_active(self):
+        return any(player.hypercharge_active for player in self.players)
+
+    def team_name(self, team):
+        """Return a fighter's name for a one-fighter team, else "Team <team>"."""
+        members = [player for player in self.players if player.team == team]
+        return members[0].name if len(members) == 1 else f"Team {team}"
+
+    def nearest_enemy(self, player):
+        """Return the living fighter on another team nearest to ``player``."""
+        return self.enemies.nearest(player)
+
+    def snapshot(self, cosmetic=True):
+        """Return the match state as bytes; particles and other visual-only effects are left out."""
+        players = self.players
+        winner = 0 if self.winning_team is None else self.team_ids.index(self.winning_team) + 1
+        if self.rng.draws != self.rng_draws:
+            version, words, gauss = self.rng.getstate()
+            self.rng_state = self.RNG_STATE.pack(*words, gauss is not None, gauss or 0.0)
+            self.rng_draws = self.rng.draws
+        parts = [b"", b"", self.rng_state]
+        parts += [player.pack_state() for player in players]
+        for player in players:
+            for projectile in player.projectiles:
+                parts.append(projectile.pack_state())
+        parts.append(self.arena.pack_state())
+        parts[1] = self.COUNTS.pack(*[len(player.projectiles) for player in players])
+        gameplay_size = self.STATE.size + sum(len(part) for part in parts)
+        parts[0] = self.STATE.pack(gameplay_size, self.tick, self.game_over, winner)
+        if cosmetic:
+            for player in players:
+                for projectile in player.projectiles:
+                    parts.append(projectile.pack_cosmetic())
+        return b"".join(parts)
+
+    def restore(self, snapshot):
+        gameplay_size, tick, game_over, winner = self.STATE.unpack_from(snapshot)
+        self.tick = tick
+        self.game_over = game_over
+        self.winning_team = self.team_ids[winner - 1] if winner else None
+        self.winner = self.team_name(self.winning_team) if winner else None
+
+        offset = self.STATE.size
+        counts = self.COUNTS.unpack_from(snapshot, offset)
+        offset += self.COUNTS.size
+        rng_state = snapshot[offset:offset + self.RNG_STATE.size]
+        if self.rng.draws != self.rng_draws or rng_state != self.rng_state:
+            values = self.RNG_STATE.unpack_from(rng_state)
+            self.rng.setstate((3, values[:625], values[626] if values[625] else None))
+            self.rng_state = rng_state
+            self.rng_draws = self.rng.draws
+        offset += self.RNG_STATE.size
+
+        for player in self.players:
+            offset = player.unpack_state(snapshot, offset)
+        restored = []
+        for player, count in zip(self.players, counts):
+            pool = player.projectiles
+            pool.clear()
+            for _ in range(count):
+                projectile = pool.acquire()
+                projectile.fx_rng = self.fx_rng
+                offset = projectile.unpack_state(snapshot, offset)
+                restored.append(projectile)
+        offset = self.arena.unpack_state(snapshot, offset)
+        if len(snapshot) > gameplay_size:
+            for projectile in restored:
+                offset = projectile.unpack_cosmetic(snapshot, offset)
+        self.enemies.rebuild()
+
+    def state_hash(self, snapshot=None):
+        """Return a stable 64-bit hash of the gameplay state, or of a snapshot's."""
+        if snapshot is None:
+            snapshot = self.snapshot(cosmetic=False)
+        gameplay_size = self.STATE.unpack_from(snapshot)[0]
+        digest = hashlib.blake2b(memoryview(snapshot)[:gameplay_size], digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
+
+    def step(self, *inputs):
+        """Advance one tick given each fighter's key state, in ``players`` order."""
+        if self.game_over:
+            return
+        self.tick += 1
+        players = self.players
+        enemies = self.enemies
+
+        profiler = self.profiler
+
+        # Knocked-out fighters stand still, but their projectiles fly on
+        for player, keys in zip(players, inputs):
+            if player.health > 0:
+                player.move(keys)
+        enemies.moved()
+        if profiler:
+            profiler.mark('move')
+
+        for player, keys in zip(players, inputs):
+            if player.health > 0:
+                player.use_ability(keys, enemies.nearest(player))
+        if profiler:
+            profiler.mark('use_ability')
+
+        for player in players:
+            player.update_projectiles(enemies)
+        if profiler:
+            profiler.mark('update_projectiles')
+
+        knockout = self.check_collisions()
+        self.update_arena()
+        if profiler:
+            profiler.mark('collision')
+
+        if not knockout:
+            return
+        enemies.rebuild()
+        standing = [player for player in players if player.health > 0]
+        if len({player.team for player in standing}) <= 1:
+            self.game_over = True
+            # A double knockout goes to the last fighter, as it always has one on one
+            self.winning_team = (standing or players[-1:])[0].team
+            self.winner = self.team_name(self.winning_team)
+
+    def update_arena(self):
+        """Expire, drop and hand out this tick's health pickups."""
+        arena = self.arena
+        if PICKUP_INTERVAL and self.tick % PICKUP_INTERVAL == 0:
+            x = self.rng.randrange(50, SCREEN_WIDTH - 50 - PICKUP_SIZE)
+            row = arena.spawn(x, GROUND - PICKUP_SIZE)
+            arena.add_lifetime(row, PICKUP_LIFETIME)
+            arena.add_collider(row, PICKUP_SIZE, PICKUP_SIZE, PICKUP_LAYER)
+            arena.add_renderable(row, PICKUP_HEALTH)
+        if not len(arena.rows(World.LIFETIME)):
+            return
+        arena.expire()
+        living = [player for player in self.players if player.health > 0]
+        rows, hits = arena.colliding([player.bounds() for player in living], PICKUP_LAYER)
+        if not hits.any():
+            return
+        # In player order, so the first fighter to touch a pickup takes it
+        for player, touched in zip(living, hits):
+            for row in rows[touched].tolist():
+                if arena.components[row]:
+                    player.health = min(player.max_health, player.health + PICKUP_HEAL)
+                    arena.kill(row)
+
+    def check_collisions(self):
+        """Resolve this tick's hits and return whether anyone was knocked out."""
+        grid = self.grid
+        grid.clear()
+        players = self.players
+        for player in players:
+            for projectile in player.projectiles:
+                grid.insert(projectile, player, *projectile.bounds())
+        if not grid.count:
+            return False
+
+        # Lightning and rockets cancel each other out
+        if PROJECTILE_CLASH and any(player.projectile is Lightning and player.projectiles for player in players):
+            for player in players:
+                if player.projectile is not Rocket:
+                    continue
+                for rocket in player.projectiles:
+                    if rocket.active:
+                        for _, projectile, *_ in grid.query(*rocket.bounds(), exclude_team=player.team):
+                            if projectile.__class__ is Lightning:
+                                projectile.active = False
+                                rocket.active = False
+                                break
+
+        knockout = False
+        for target in players:
+            if target.health <= 0:
+                continue
+            for _, projectile, owner, *_ in grid.query(*target.bounds(), exclude_team=target.team):
+                owner.record_damage(projectile.ability, target.take_damage(projectile.damage))
+                projectile.active = False
+            knockout = knockout or target.health <= 0
+        return knockout
+
+
+class Frame:
+    """One tick of a Match as published by SimulationThread.
+
+    Holds the full snapshot, cosmetic tail included, plus copies of each
+    fighter's particles, which snapshots leave out. ``apply`` loads it into
+    a render-side Match that mirrors the simulated one.
+    """
+    def __init__(self, match):
+        self.tick = -1
+        # perf_counter time the tick was published, for interpolation
+        self.time = 0.0
+        self.snapshot = b""
+        self.particles = [[ParticleSystem(system.capacity) for system in player.particle_systems()]
+                          for player in match.players]
+
+    def capture(self, match, now):
+        self.tick = match.tick
+        self.time = now
+        self.snapshot = match.snapshot()
+        for copies, player in zip(self.particles, match.players):
+            for copy, system in zip(copies, player.particle_systems()):
+                copy.copy_from(system)
+
+    def apply(self, view):
+        view.restore(self.snapshot)
+        for copies, player in zip(self.particles, view.players):
+            for copy, system in zip(copies, player.particle_systems()):
+                system.copy_from(copy)
+
+
+class TripleBuffer:
+    """Hands the newest Frame from one writer thread to one reader thread.
+
+    The writer fills ``back()`` and calls ``publish``; the reader takes
+    ``latest()``. With three slots the writer never waits for the reader or
+    touches the slot being read, so a published Frame stays unchanged while
+    the reader holds it, and the reader always gets the newest one. The lock
+    only guards swapping slot indices.
+    """
+    def __init__(self, make_slot):
+        self.slots = [make_slot() for _ in range(3)]
+        self.back_index, self.ready_index, self.front_index = 0, 1, 2
+        self.fresh = False
+        self.published = False
+        self.lock = threading.Lock()
+
+    def back(self):
+        return self.slots[self.back_index]
+
+    def publish(self):
+        with self.lock:
+            self.back_index, self.ready_index = self.ready_index, self.back_index
+            self.fresh = True
+
+    def latest(self):
+        """Return the newest published slot, or None before the first."""
+        with self.lock:
+            if self.fresh:
+                self.front_index, self.ready_index = self.ready_index, self.front_index
+                self.fresh = False
+                self.published = True
+        return self.slots[self.front_index] if self.published else None
+
+
+class SimulationThread(threading.Thread):
+    """Steps a match at TICK_RATE on its own thread, independent of rendering.
+
+    Every tick calls ``advance(keys)`` with the newest key state from
+    ``set_keys``, which the main thread calls between draw stages, then publishes a Frame of ``match`` to ``frames``. Work that
+    must happen between ticks, such as a restart, is queued with ``call``. An
+    exception stops the thread and is kept in ``error``.
+    """
+    def __init__(self, match, advance, keys=NO_KEYS):
+        super().__init__(name="simulation", daemon=True)
+        self.match = match
+        self.advance = advance
+        self.keys = keys
+        self.frames = TripleBuffer(lambda: Frame(match))
+        self.calls = deque()
+        self.stopping = threading.Event()
+        self.error = None
+        # Worst delay between a tick falling due and its frame being published
+        self.max_lateness = 0.0
+        # Worst age of the key state a tick was advanced with
+        self.keys_time = time.perf_counter()
+        self.max_input_age = 0.0
+
+    def set_keys(self, keys):
+        self.keys = keys
+        self.keys_time = time.perf_counter()
+
+    def call(self, function):
+        self.calls.append(function)
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+
+    def run(self):
+        try:
+            self.loop()
+        except BaseException as error:
+            self.error = error
+
+    def loop(self):
+        tick_time = 1.0 / TICK_RATE
+        frames = self.frames
+        next_tick = time.perf_counter()
+        while not self.stopping.is_set():
+            while self.calls:
+                self.calls.popleft()()
+            now = time.perf_counter()
+            if now < next_tick:
+                time.sleep(next_tick - now)
+                continue
+            self.max_input_age = max(self.max_input_age, now - self.keys_time)
+            self.advance(self.keys)
+            published = time.perf_counter()
+            frames.back().capture(self.match, published)
+            frames.publish()
+            self.max_lateness = max(self.max_lateness, published - next_tick)
+            next_tick += tick_time
+            if now - next_tick > MAX_FRAME_TIME:
+                # Too far behind to catch up: drop the backlog instead of spiralling
+                next_tick = now
+
+
+def make_scenery(fx_rng):
+    """Create the World of animated background decorations: clouds, stars, chickens and candies."""
+    scenery = World(rng=fx_rng)
+    for _ in range(5):
+        spawn_cloud(scenery, fx_rng)
+    for _ in range(50):
+        spawn_star(scenery, fx_rng)
     # Add pixel chickens and candies
-    chickens = [
-        PixelChicken(random.randint(0, SCREEN_WIDTH), GROUND - random.randint(20, 90), random.uniform(0.3, 0.7))
-        for _ in range(3)
-    ]
-    candies = [
-        Candy(random.randint(0, SCREEN_WIDTH), random.randint(80, GROUND - 200), random.uniform(-0.15, 0.15))
-        for _ in range(8)
-    ]
-
+    for _ in range(3):
+        spawn_chicken(scenery, fx_rng)
+    for _ in range(8):
+        spawn_candy(scenery, fx_rng)
+    return scenery
+
+
+def main(seed=None, record_path=None, profile_path=None, fps=FPS, bot_player=None, online=None,
+         quality_level=None, dirty_rects=False, roster=DEFAULT_ROSTER, teams=None, threaded=False):
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Telesheepy vs Rocket Hair")
+    clock = pygame.time.Clock()
+
+    match = Match(seed, roster=roster, teams=teams)
+    fx_rng = match.fx_rng
+
+    # F3 toggles the profiler overlay, F4 writes its frames to CSV
+    profiler = FrameProfiler(keep_all=profile_path is not None)
+    match.profiler = profiler
+
+    # Detail follows the frame budget unless a fixed quality level is asked for
+    governor = None
+    if quality_level is None:
+        governor = QualityGovernor(1.0 / (fps or FPS), quality)
+    else:
+        quality.set_level(quality_level)
 
-    player1 = Telesheepy(100, GROUND - 80, {
-        'left': pygame.K_a,
-        'right': pygame.K_d,
-        'up': pygame.K_w,
-        'down': pygame.K_s
-    })
+    # Initialize background elements HERE inside main()
+    scenery = make_scenery(fx_rng)
+
+    # Optionally redraw and present only what changed each frame
+    renderer = DirtyRenderer() if dirty_rects else None
+
+    # The computer can take over either keyboard side, and plays every fighter after them
+    bot_indices = set(range(2, len(match.players)))
+    if bot_player:
+        bot_indices.add(bot_player - 1)
+    bots = {}
+    if bot_indices:
+        from bot import RuleBot
+        bots = {i: RuleBot(random.Random(match.seed + i)) for i in sorted(bot_indices)}
+
+    # Online play: online is (local player, local port, (peer host, peer port))
+    session = None
+    if online:
+        from netplay import RollbackSession, UdpTransport
+        player, port, peer = online
+        session = RollbackSession(match, player, UdpTransport(port, peer))
+
+    # Each match is recorded to its own file when recording is on
+    recorder = None
+    recorded_matches = 0
+    if record_path:
+        from replay import ReplayRecorder
+        recorder = ReplayRecorder(match)
+
+    def advance(keys):
+        """Run one simulation tick from the held keys."""
+        if session:
+            # Rollback needs every tick to go through the session, even after the game ends
+            local, remote = (match.player1, match.player2) if session.player == 1 else (match.player2, match.player1)
+            if bot_player == session.player:
+                session.advance(bots[session.player - 1](match, local, remote))
+            else:
+                session.advance(local.encode_input(keys))
+        elif not match.game_over:
+            inputs = [keys] * len(match.players)
+            for i, bot in bots.items():
+                player = match.players[i]
+                opponent = match.nearest_enemy(player)
+                inputs[i] = player.decode_input(bot(match, player, opponent)) if opponent else NO_KEYS
+            if match.profiler:
+                match.profiler.mark('sim')
+            if recorder:
+                recorder.step(*inputs)
+            else:
+                match.step(*inputs)
+
+    def restart():
+        nonlocal recorder, recorded_matches
+        if recorder:
+            recorded_matches += 1
+            recorder.save(numbered_path(record_path, recorded_matches))
+        match.reset()
+        if recorder:
+            recorder = ReplayRecorder(match)
+
+    # Threaded mode simulates on its own thread and draws a mirror of the
+    # latest published tick, so heavy frames cannot delay the simulation
+    simulation = None
+    shown = match
+    render_rng = fx_rng
+    if threaded:
+        match.profiler = None
+        shown = Match(match.seed, roster=roster, teams=teams)
+        # Cosmetics drawn here must not share fx_rng with the simulation thread
+        render_rng = random.Random(f"render-{match.seed}")
+        scenery = make_scenery(render_rng)
+        # Hand the GIL over often so a tick falling due is not held up by a long draw
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(0.001)
+        simulation = SimulationThread(match, advance)
+        simulation.start()
+    
+    def poll_keys():
+        # Keys read once per frame would age with draw cost; pumping leaves
+        # the events queued for the next event.get()
+        pygame.event.pump()
+        simulation.set_keys(pygame.key.get_pressed())
     
-    player2 = RocketHair(SCREEN_WIDTH - 150, GROUND - 80, {
-        'left': pygame.K_j,
-        'right': pygame.K_l,
-        'up': pygame.K_i,
-        'down': pygame.K_k
-    })
+    shown_time = None
     
     running = True
-    game_over = False
-    winner = None
-    frame_count = 0
     screen_shake = 0
+    tick_time = 1.0 / TICK_RATE
+    accumulator = 0.0
+    previous = time.perf_counter()
     
     while running:
-        clock.tick(FPS)
-        frame_count += 1
+        clock.tick(fps)
+        profiler.start_frame()
+        now = time.perf_counter()
+        accumulator += min(now - previous, MAX_FRAME_TIME)
+        previous = now
         
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -1084,115 +3007,167 @@ def main():
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     running = False
-                if game_over and event.key == pygame.K_r:
-                    player1.health = 100
-                    player2.health = 100
-                    player1.x = 100
-                    player2.x = SCREEN_WIDTH - 150
-                    player1.y = GROUND - 80
-                    player2.y = GROUND - 80
-                    player1.lightnings = []
-                    player2.rockets = []
-                    player1.particles = []
-                    player2.particles = []
-                    player1.ability_cooldowns = {'1': 0, '2': 0, '3': 0}
-                    player2.ability_cooldowns = {'7': 0, '8': 0, '9': 0}
-                    player1.hypercharge_ready = True
-                    player2.hypercharge_ready = True
-                    player1.hypercharge_cooldown = 0
-                    player2.hypercharge_cooldown = 0
-                    player1.hypercharge_active = False
-                    player2.hypercharge_active = False
-                    game_over = False
-                    winner = None
-        
-        if not game_over:
-            keys = pygame.key.get_pressed()
-            
-            player1.move(keys)
-            player2.move(keys)
-            
-            player1.use_ability(keys)
-            player2.use_ability(keys, player1)
-            
-            player1.update_projectiles()
-            player2.update_projectiles(player1)
+                if event.key == pygame.K_F3:
+                    profiler.visible = not profiler.visible
+                if event.key == pygame.K_F4:
+                    profiler.export_csv(profile_path or "frame_profile.csv")
+                if shown.game_over and event.key == pygame.K_r and not session:
+                    if simulation:
+                        simulation.call(restart)
+                    else:
+                        restart()
+        
+        keys = pygame.key.get_pressed()
+        if simulation:
+            simulation.set_keys(keys)
+            poll = poll_keys
+        else:
+            poll = None
+        profiler.mark('input')
+        
+        # Run as many fixed ticks as real time calls for, rendering in between
+        ticks = 0
+        while accumulator >= tick_time and ticks < MAX_CATCH_UP:
+            accumulator -= tick_time
+            ticks += 1
+            update_scenery(scenery)
+            if simulation:
+                # The simulation thread keeps its own time
+                continue
+            advance(keys)
+            if match.game_over:
+                continue
             
             # Screen shake during hypercharge
-            if player1.hypercharge_active or player2.hypercharge_active:
-                screen_shake = random.randint(-3, 3)
+            if match.hypercharge_active:
+                screen_shake = fx_rng.randint(-3, 3)
             else:
                 screen_shake = 0
-            
-            for lightning in player1.lightnings:
-                if lightning.get_rect().colliderect(player2.get_rect()):
-                    player2.take_damage(lightning.damage)
-                    lightning.active = False
-            
-            for rocket in player2.rockets:
-                if rocket.get_rect().colliderect(player1.get_rect()):
-                    player1.take_damage(rocket.damage)
-                    rocket.active = False
-            
-            if player1.health <= 0:
-                game_over = True
-                winner = "Rocket Hair"
-            elif player2.health <= 0:
-                game_over = True
-                winner = "Telesheepy"
-        
-        # Apply screen shake
-        shake_x = random.randint(-screen_shake, screen_shake) if screen_shake > 0 else 0
-        shake_y = random.randint(-screen_shake, screen_shake) if screen_shake > 0 else 0
-        
-        # Clear screen
-        screen.fill(BLACK)
-        
-        # Create a surface to draw everything on, then blit it with shake offset
-        game_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        
-        # Drawing to game surface
-        draw_background(game_surface, clouds, stars, chickens, candies)
-        
-        player1.draw(game_surface)
-        player2.draw(game_surface)
-        
-        draw_health_bar(game_surface, 20, 20, player1.health, player1.max_health, "Telesheepy")
-        draw_health_bar(game_surface, SCREEN_WIDTH - 220, 20, player2.health, player2.max_health, "Rocket Hair")
-        
-        draw_cooldown_indicators(game_surface, player1, 20, 60)
-        draw_cooldown_indicators(game_surface, player2, SCREEN_WIDTH - 220, 60)
-        
-        font_small = pygame.font.Font(None, 18)
-        help_text1 = font_small.render("P1: WASD=Move, 1/2/3=Skills, 4=HYPERCHARGE", True, WHITE)
-        help_text2 = font_small.render("P2: IJKL=Move, 7/8/9=Skills, 0=HYPERCHARGE", True, WHITE)
+        if accumulator >= tick_time:
+            # Too far behind to catch up: drop the backlog instead of spiralling
+            accumulator %= tick_time
+        profiler.mark('sim')
+        
+        if simulation:
+            if simulation.error:
+                raise simulation.error
+            frame = simulation.frames.latest()
+            if frame and frame.time != shown_time:
+                frame.apply(shown)
+                shown_time = frame.time
+                screen_shake = render_rng.randint(-3, 3) if shown.hypercharge_active and not shown.game_over else 0
+            # Draw between the published tick and the next one
+            alpha = 1.0 if shown.game_over or not frame else min(1.0, (now - frame.time) / tick_time)
+        else:
+            # Draw between the last two ticks; a finished match holds still
+            alpha = 1.0 if match.game_over else accumulator / tick_time
         
-        pygame.draw.rect(game_surface, BLACK, (SCREEN_WIDTH // 2 - 180, SCREEN_HEIGHT - 50, 360, 45))
-        game_surface.blit(help_text1, (SCREEN_WIDTH // 2 - 170, SCREEN_HEIGHT - 45))
-        game_surface.blit(help_text2, (SCREEN_WIDTH // 2 - 170, SCREEN_HEIGHT - 25))
+        # Screen shake moves the camera over the back-buffer
+        shake_x = render_rng.randint(-screen_shake, screen_shake) if screen_shake > 0 else 0
+        shake_y = render_rng.randint(-screen_shake, screen_shake) if screen_shake > 0 else 0
         
-        if game_over:
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-            overlay.set_alpha(128)
-            overlay.fill(BLACK)
-            game_surface.blit(overlay, (0, 0))
+        # Drawing to the persistent back-buffer
+        game_surface = frame_buffers.back_buffer(screen.get_size())
+        if renderer and not (screen_shake or shown.hypercharge_active or shown.game_over):
+            renderer.render(screen, game_surface, shown, scenery, alpha, profiler, poll)
+        else:
+            if renderer:
+                # Shake, hypercharge and the game over overlay cover the whole screen
+                renderer.invalidate()
+            draw_background(game_surface, scenery)
+            profiler.mark('draw_background')
+            if poll:
+                poll()
             
-            font_large = pygame.font.Font(None, 72)
-            winner_text = font_large.render(f"{winner} WINS!", True, GOLD)
-            text_rect = winner_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
-            game_surface.blit(winner_text, text_rect)
+            draw_pickups(game_surface, shown.arena)
+            for player in shown.players:
+                player.draw(game_surface, alpha)
+                if poll:
+                    poll()
+            profiler.mark('characters')
             
-            font_medium = pygame.font.Font(None, 36)
-            restart_text = font_medium.render("Press R to Restart or ESC to Quit", True, WHITE)
-            restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 50))
-            game_surface.blit(restart_text, restart_rect)
-        
-        # Blit the entire game surface to screen with shake offset
-        screen.blit(game_surface, (shake_x, shake_y))
-        pygame.display.flip()
+            draw_hud(game_surface, shown)
+            profiler.draw(game_surface)
+            profiler.mark('hud')
+            if poll:
+                poll()
+            
+            # Present at the camera offset; only a shaken frame exposes the border
+            if shake_x or shake_y:
+                screen.fill(BLACK)
+            screen.blit(game_surface, (shake_x, shake_y))
+            pygame.display.flip()
+        profiler.mark('present')
+        profiler.end_frame(shown)
+        if governor:
+            # Time spent working this frame, not sleeping in the frame cap
+            governor.update(time.perf_counter() - now)
     
+    if simulation:
+        simulation.stop()
+        sys.setswitchinterval(switch_interval)
+    if recorder:
+        recorder.save(numbered_path(record_path, recorded_matches + 1))
+    if profile_path:
+        profiler.export_csv(profile_path)
     pygame.quit()
 
 
+def seed_arg(text):
+    """Parse --seed; replays store it as an unsigned 64-bit integer."""
+    seed = int(text)
+    if not 0 <= seed < 2 ** 64:
+        raise argparse.ArgumentTypeError(f"seed must be from 0 to 2**64 - 1, got {seed}")
+    return seed
+
+
+def numbered_path(path, n):
+    """Return ``path`` for the first match and ``name-<n>.ext`` after restarts."""
+    if n <= 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-{n}{ext}"
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Telesheepy vs Rocket Hair")
+    parser.add_argument("--seed", type=seed_arg, help="seed for gameplay randomness")
+    parser.add_argument("--record", metavar="PATH", help="record each match to a replay file")
+    parser.add_argument("--profile", metavar="PATH", help="write per-frame phase timings to a CSV file on exit")
+    parser.add_argument("--fps", type=int, default=FPS,
+                        help=f"render frame cap, 0 for uncapped (the game always simulates {TICK_RATE} ticks/s)")
+    parser.add_argument("--bot", type=int, choices=(1, 2), metavar="PLAYER",
+                        help="let the computer play player 1 or 2")
+    parser.add_argument("--online", metavar="HOST:PORT", help="play online against the peer at this address")
+    parser.add_argument("--player", type=int, choices=(1, 2), help="which player this side controls online")
+    parser.add_argument("--port", type=int, default=7000, help="local UDP port for online play")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="redraw and update only the changed parts of the screen")
+    parser.add_argument("--quality", type=int, choices=range(len(Quality.LEVELS)), metavar="LEVEL",
+                        help=f"fix visual detail at 0-{len(Quality.LEVELS) - 1} instead of adapting to the frame rate")
+    parser.add_argument("--fighters", nargs="+", choices=sorted(CHARACTERS), default=list(DEFAULT_ROSTER),
+                        metavar="NAME", help=f"2 to {MAX_FIGHTERS} characters ({', '.join(CHARACTERS)}); "
+                                             "fighters after the second are played by the computer")
+    parser.add_argument("--teams", nargs="+", type=int, metavar="TEAM",
+                        help="team of each fighter, e.g. 1 1 2 2 (default: free-for-all)")
+    parser.add_argument("--threaded", action="store_true",
+                        help="simulate on a separate thread so rendering cannot delay ticks")
+    args = parser.parse_args()
+    if not 2 <= len(args.fighters) <= MAX_FIGHTERS:
+        parser.error(f"--fighters takes 2 to {MAX_FIGHTERS} characters")
+    if args.teams is not None and (len(args.teams) != len(args.fighters) or len(set(args.teams)) < 2):
+        parser.error("--teams needs one team per fighter and at least two different teams")
+    if tuple(args.fighters) != DEFAULT_ROSTER and (args.record or args.online):
+        parser.error("--record and --online only support the default Telesheepy vs RocketHair roster")
+    if args.threaded and args.online:
+        parser.error("--threaded cannot be combined with --online")
+    online = None
+    if args.online:
+        host, _, peer_port = args.online.rpartition(":")
+        if not host or not peer_port.isdigit() or args.player is None:
+            parser.error("--online needs HOST:PORT and --player 1 or 2; both sides must use the same --seed")
+        online = (args.player, args.port, (host, int(peer_port)))
+        if args.seed is None:
+            args.seed = 0
+    main(args.seed, args.record, args.profile, args.fps, args.bot, online, args.quality, args.dirty_rects,
+         args.fighters, args.teams, args.threaded)
\ No newline at end of file
@@ -0,0 +1,272 @@
+"""Benchmarks for the simulation and render paths.
+
+Each scripted scenario is played twice from the same seed: once headless
+(``visuals=False``, as tournaments and training run it) to measure ticks per
+second of ``Match.step``, and once with visuals to time ``draw_background``,
+the character draws and the HUD against an off-screen surface (SDL's dummy
+video driver, so no window opens)::
+
+    python bench.py --out bench_baseline.json
+    python bench.py --baseline bench_baseline.json --tolerance 0.1
+
+With ``--baseline`` every metric is compared against the stored run and the
+exit status is 1 if any is more than ``--tolerance`` slower. Baselines are
+only meaningful on the machine that recorded them.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import numpy as np
+import pygame
+
+import app
+from bot import ABILITY_BITS, HYPERCHARGE
+
+SPAM = ABILITY_BITS[0] | ABILITY_BITS[1] | ABILITY_BITS[2]
+# Enough health that nobody dies while the scenario runs
+ENDLESS_HEALTH = 1e6
+PROJECTILE_TARGET = 500
+# Cheap scenarios step for at least this many seconds so timer noise averages out
+MIN_TIME = 0.25
+
+# Higher is better for every metric
+METRICS = ('ticks_per_s', 'draw_background_fps', 'characters_fps', 'hud_fps', 'frame_fps')
+
+
+class Scenario:
+    """Inputs and per-tick upkeep for one benchmark; subclasses override ``inputs`` and ``upkeep``."""
+    name = None
+
+    def make_match(self, seed, visuals):
+        return app.Match(seed, visuals=visuals)
+
+    def setup(self, match):
+        for player in (match.player1, match.player2):
+            player.health = player.max_health = ENDLESS_HEALTH
+
+    def inputs(self, match):
+        return 0, 0
+
+    def upkeep(self, match):
+        pass
+
+
+class Idle(Scenario):
+    """Both fighters stand still."""
+    name = 'idle'
+
+
+class AbilitySpam(Scenario):
+    """Both fighters hold every ability key, firing each one as soon as it cools down."""
+    name = 'ability_spam'
+
+    def inputs(self, match):
+        return SPAM, SPAM
+
+
+class DoubleHypercharge(Scenario):
+    """Both fighters stay hypercharged, re-arming as soon as it wears off, and keep firing."""
+    name = 'double_hypercharge'
+
+    def inputs(self, match):
+        return SPAM | HYPERCHARGE, SPAM | HYPERCHARGE
+
+    def upkeep(self, match):
+        for player in (match.player1, match.player2):
+            if not player.hypercharge_active:
+                player.hypercharge_cooldown = 0
+                player.hypercharge_ready = True
+
+
+class LiveProjectiles(Scenario):
+    """Keeps ``count`` projectiles in flight, half lightning and half rockets, topped up every tick."""
+    name = 'projectiles_500'
+
+    def __init__(self, count=PROJECTILE_TARGET):
+        self.count = count
+
+    def setup(self, match):
+        super().setup(match)
+        self.rng = random.Random(match.seed)
+
+    def upkeep(self, match):
+        rng = self.rng
+        telesheepy = match.player1
+        rocket_hair = match.player2
+        while len(telesheepy.lightnings) < self.count // 2:
+            telesheepy.lightnings.spawn(rng.uniform(0, app.SCREEN_WIDTH), rng.uniform(0, app.GROUND - 100),
+                                        rng.choice((-1, 1)), rng.random() < 0.5, match.fx_rng)
+        while len(rocket_hair.rockets) < self.count - self.count // 2:
+            rocket_hair.rockets.spawn(rng.uniform(0, app.SCREEN_WIDTH), rng.uniform(0, app.GROUND - 100),
+                                      rng.choice((-1, 1)), rng.uniform(0, app.GROUND), match.fx_rng)
+
+    def make_match(self, seed, visuals):
+        # The default pools are far smaller than the scenario needs
+        capacities = app.LIGHTNING_CAPACITY, app.ROCKET_CAPACITY
+        app.LIGHTNING_CAPACITY = app.ROCKET_CAPACITY = self.count
+        try:
+            return app.Match(seed, visuals=visuals)
+        finally:
+            app.LIGHTNING_CAPACITY, app.ROCKET_CAPACITY = capacities
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (Idle, AbilitySpam, DoubleHypercharge, LiveProjectiles)}
+
+
+def make_match(scenario, seed, visuals):
+    match = scenario.make_match(seed, visuals)
+    scenario.setup(match)
+    scenario.upkeep(match)
+    return match
+
+
+def advance(scenario, match):
+    p1_mask, p2_mask = scenario.inputs(match)
+    match.step(match.player1.decode_input(p1_mask), match.player2.decode_input(p2_mask))
+    scenario.upkeep(match)
+
+
+def measure_ticks(cls, ticks, seed, warmup, min_time=MIN_TIME):
+    """Return headless ticks per second, stepping in rounds of ``ticks`` until ``min_time`` has been measured."""
+    scenario = cls()
+    match = make_match(scenario, seed, visuals=False)
+    for _ in range(warmup):
+        advance(scenario, match)
+    elapsed = 0.0
+    measured = 0
+    while elapsed < min_time:
+        for _ in range(ticks):
+            p1_mask, p2_mask = scenario.inputs(match)
+            p1_input = match.player1.decode_input(p1_mask)
+            p2_input = match.player2.decode_input(p2_mask)
+            start = time.perf_counter()
+            match.step(p1_input, p2_input)
+            elapsed += time.perf_counter() - start
+            scenario.upkeep(match)
+        measured += ticks
+    return measured / elapsed
+
+
+def measure_frames(cls, ticks, seed, warmup, surface):
+    """Return seconds spent in (draw_background, characters, hud) over ``ticks`` frames, one per tick."""
+    scenario = cls()
+    match = make_match(scenario, seed, visuals=True)
+    scenery = app.make_scenery(match.fx_rng)
+    totals = np.zeros(3)
+    for tick in range(warmup + ticks):
+        app.update_scenery(scenery)
+        advance(scenario, match)
+
+        start = time.perf_counter()
+        app.draw_background(surface, scenery)
+        background = time.perf_counter()
+        match.player1.draw(surface)
+        match.player2.draw(surface)
+        characters = time.perf_counter()
+        app.draw_hud(surface, match)
+        hud = time.perf_counter()
+        if tick >= warmup:
+            totals += (background - start, characters - background, hud - characters)
+    return totals
+
+
+def run_scenario(cls, ticks=600, seed=0, warmup=60, repeat=3, surface=None):
+    """Return the metrics of one scenario, keeping the best of ``repeat`` runs of each."""
+    if surface is None:
+        surface = pygame.Surface((app.SCREEN_WIDTH, app.SCREEN_HEIGHT))
+    ticks_per_s = max(measure_ticks(cls, ticks, seed, warmup) for _ in range(repeat))
+    phases = np.min([measure_frames(cls, ticks, seed, warmup, surface) for _ in range(repeat)], axis=0)
+    background, characters, hud = (ticks / phases).tolist()
+    return {
+        'ticks_per_s': ticks_per_s,
+        'draw_background_fps': background,
+        'characters_fps': characters,
+        'hud_fps': hud,
+        'frame_fps': ticks / phases.sum(),
+    }
+
+
+def run(names=None, ticks=600, seed=0, warmup=60, repeat=3, quality_level=None):
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    app.quality.set_level(len(app.Quality.LEVELS) - 1 if quality_level is None else quality_level)
+    results = {}
+    for name in names or SCENARIOS:
+        results[name] = run_scenario(SCENARIOS[name], ticks, seed, warmup, repeat)
+        print(f"{name:<20}" + "  ".join(f"{metric} {value:9.1f}" for metric, value in results[name].items()))
+    return {
+        'meta': {
+            'ticks': ticks,
+            'seed': seed,
+            'repeat': repeat,
+            'quality': app.quality.level,
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+        },
+        'scenarios': results,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print each metric against the baseline and return the (scenario, metric) pairs that regressed."""
+    regressions = []
+    for name, metrics in results['scenarios'].items():
+        expected = baseline['scenarios'].get(name)
+        if expected is None:
+            print(f"{name}: not in baseline")
+            continue
+        for metric in METRICS:
+            if metric not in expected:
+                continue
+            change = metrics[metric] / expected[metric] - 1
+            slower = change < -tolerance
+            if slower:
+                regressions.append((name, metric))
+            print(f"  {name:<20}{metric:<22}{expected[metric]:10.1f} -> {metrics[metric]:10.1f}  "
+                  f"{change:+7.1%}{'  REGRESSION' if slower else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Telesheepy vs Rocket Hair simulation and renderer.")
+    parser.add_argument('scenarios', nargs='*', metavar='SCENARIO',
+                        help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument('--ticks', type=int, default=600, help="measured ticks per scenario")
+    parser.add_argument('--warmup', type=int, default=60, help="unmeasured ticks before each run")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per scenario; the best is kept")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--quality', type=int, choices=range(len(app.Quality.LEVELS)), help="visual quality level")
+    parser.add_argument('--out', metavar='PATH', help="write the results to a JSON file")
+    parser.add_argument('--baseline', metavar='PATH', help="compare against results stored by --out")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="allowed slowdown against the baseline as a fraction (default 0.1)")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+
+    results = run(args.scenarios, args.ticks, args.seed, args.warmup, args.repeat, args.quality)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metrics more than {args.tolerance:.0%} slower than {args.baseline}")
+            sys.exit(1)
+        print(f"within {args.tolerance:.0%} of {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""Rule-based computer opponent.
+
+``RuleBot`` is a policy like the ones in ``tournament.py``: called as
+``bot(match, me, opponent)`` once per tick, it returns the input mask for
+``me`` (see ``Character.encode_input``), which ``me.decode_input`` turns into
+the key state ``move`` and ``use_ability`` read. It only looks at the current
+state, so it runs the same in live games, replays and headless batches.
+
+Each tick it projects every incoming projectile forward along its velocity
+to find when it would reach ``me`` (its time to impact), then dodges the most
+urgent one by jumping, running or hypercharging, and otherwise holds a
+firing range and picks the ability whose shot would land.
+"""
+import app
+
+# Input mask bits, see Character.encode_input
+LEFT, RIGHT, UP, DOWN = 1, 2, 4, 8
+ABILITY_BITS = (16, 32, 64, 128)
+HYPERCHARGE = ABILITY_BITS[3]
+
+# Per-tick gravity, see Character.move
+GRAVITY = 0.8
+# Rocket steering, see Rocket.update
+ROCKET_TURN = 0.3
+ROCKET_MAX_SPEED_Y = 5
+
+# React to threats arriving within this many ticks; later ones are ignored
+DODGE_TICKS = 12
+# Hypercharge to soak a volley when at least this much damage is incoming
+SOAK_DAMAGE = 40
+# Hypercharge when the opponent is this close or this weak
+HYPERCHARGE_RANGE = 400
+HYPERCHARGE_FINISH_HEALTH = 30
+
+_jump_arcs = {}
+
+
+def jump_arc(jump_power):
+    """Return the height above the ground, per tick, of a jump starting now."""
+    arc = _jump_arcs.get(jump_power)
+    if arc is None:
+        arc = [0.0]
+        height = 0.0
+        velocity = jump_power
+        while True:
+            velocity -= GRAVITY
+            height += velocity
+            if height <= 0:
+                break
+            arc.append(height)
+        _jump_arcs[jump_power] = arc
+    return arc
+
+
+def time_to_impact(projectile, left, top, right, bottom):
+    """Return (entry, exit) ticks until ``projectile`` overlaps the box horizontally, or None."""
+    vx, _ = projectile.velocity()
+    p_left, _, p_right, _ = projectile.bounds()
+    if vx > 0:
+        entry = (left - p_right) / vx
+        exit = (right - p_left) / vx
+    elif vx < 0:
+        entry = (p_left - right) / -vx
+        exit = (p_right - left) / -vx
+    else:
+        return None
+    if exit < 0 or entry > DODGE_TICKS:
+        return None
+    return max(entry, 0.0), exit
+
+
+def hits(projectile, entry, exit, top, bottom, lift=None):
+    """Whether ``projectile`` overlaps the span ``top``..``bottom`` between ticks ``entry`` and ``exit``.
+
+    ``lift`` optionally gives how far the span has risen after each tick
+    (a jump arc); homing rockets steer after the moving span as they do in play.
+    """
+    _, p_top, _, p_bottom = projectile.bounds()
+    first = int(entry)
+    last = int(exit) + 1
+    steer = projectile.homing
+    _, vy = projectile.velocity()
+    if lift is None and not vy and not steer:
+        # Level flight at a standing target
+        return p_top < bottom and p_bottom > top
+    shift = 0.0
+    for tick in range(last + 1):
+        rise = 0.0
+        if lift is not None and tick < len(lift):
+            rise = lift[tick]
+        if steer:
+            vy += ROCKET_TURN if p_top + shift + 10 < (top + bottom) / 2 - rise else -ROCKET_TURN
+            vy = max(-ROCKET_MAX_SPEED_Y, min(ROCKET_MAX_SPEED_Y, vy))
+        shift += vy
+        if tick >= first and p_top + shift < bottom - rise and p_bottom + shift > top - rise:
+            return True
+    return False
+
+
+class RuleBot:
+    """Dodges by time to impact and fires the ability most likely to land."""
+    def __init__(self, rng, preferred_range=350):
+        self.rng = rng
+        # A little variety between bots so mirror matches do not lock step
+        self.preferred_range = preferred_range + rng.randint(-40, 40)
+
+    def threats(self, me, enemies):
+        """Return (entry, exit, projectile) for each incoming projectile that would hit ``me`` standing still."""
+        left, top, right, bottom = me.bounds()
+        found = []
+        for projectile in (p for enemy in enemies for p in enemy.projectiles):
+            if not projectile.active:
+                continue
+            impact = time_to_impact(projectile, left, top, right, bottom)
+            if impact is None:
+                continue
+            entry, exit = impact
+            # Hits landing while we are still flashing from the last one do nothing
+            if exit <= me.hit_cooldown:
+                continue
+            if hits(projectile, entry, exit, top, bottom):
+                found.append((entry, exit, projectile))
+        return found
+
+    def jump_clears(self, me, threat):
+        """Whether jumping now keeps ``me`` clear of ``threat`` for its whole pass."""
+        entry, exit, projectile = threat
+        return not hits(projectile, entry, exit, me.y, me.y + me.height, jump_arc(me.jump_power))
+
+    def dodge(self, me, threats):
+        """Return the mask that gets ``me`` out of the way of the most urgent threat."""
+        urgent = min(threats, key=lambda threat: threat[0])
+        projectile = urgent[2]
+        incoming = sum(threat[2].damage for threat in threats)
+        if me.hypercharge_ready and incoming >= SOAK_DAMAGE:
+            return HYPERCHARGE
+        if me.on_ground and self.jump_clears(me, urgent):
+            return UP
+        # Run with the projectile to buy time
+        return RIGHT if projectile.velocity()[0] > 0 else LEFT
+
+    def attack(self, me, opponent, dx):
+        """Return the ability bit to fire this tick, or 0."""
+        if (me.direction > 0) != (dx > 0):
+            return 0
+        distance = abs(dx)
+        if me.hypercharge_ready and (distance < HYPERCHARGE_RANGE or opponent.health <= HYPERCHARGE_FINISH_HEALTH):
+            return HYPERCHARGE
+
+        # Lightning flies level; only rockets steer onto a jumping opponent
+        if not me.projectile.homing and abs(opponent.y - me.y) >= opponent.height:
+            return 0
+        # Shots arriving during the opponent's hit flash are wasted
+        if distance / 12 < opponent.hit_cooldown:
+            return 0
+
+        # The later abilities in each kit hit harder or wider, so try them first
+        cooldowns = me.ability_cooldowns
+        for i in range(len(cooldowns) - 1, -1, -1):
+            if cooldowns[i] == 0:
+                return ABILITY_BITS[i]
+        return 0
+
+    def __call__(self, match, me, opponent):
+        dx = (opponent.x + opponent.width / 2) - (me.x + me.width / 2)
+        # Dodge every enemy's shots, not just those of the one we are fighting
+        threats = self.threats(me, match.enemies.enemies(me.team))
+        if threats:
+            return self.dodge(me, threats) | self.attack(me, opponent, dx)
+
+        mask = 0
+        distance = abs(dx)
+        toward = RIGHT if dx > 0 else LEFT
+        away = LEFT if dx > 0 else RIGHT
+        if distance > self.preferred_range + 50:
+            mask |= toward
+        elif distance < self.preferred_range - 50 and 0 < me.x < app.SCREEN_WIDTH - me.width:
+            mask |= away
+        elif (me.direction > 0) != (dx > 0):
+            mask |= toward
+        return mask | self.attack(me, opponent, dx)
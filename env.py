@@ -0,0 +1,226 @@
+"""Gymnasium environments for training bots on the Telesheepy vs Rocket Hair fight.
+
+``SheepyEnv`` wraps one headless Match; ``SheepyVectorEnv`` steps N matches
+in lockstep and returns observations, rewards and done flags as batched
+arrays. Neither touches the display::
+
+    import env
+    envs = env.SheepyVectorEnv(64, opponent="scripted")
+    obs, info = envs.reset(seed=0)
+    obs, reward, terminated, truncated, info = envs.step(envs.action_space.sample())
+
+An action is the agent's input mask (see ``Character.encode_input``): bits
+0-3 hold left/right/up/down and bits 4-7 the three abilities and
+hypercharge, so the 256 actions cover every combination of its keys.
+
+The observation is a float32 vector from the agent's side: its own fighter,
+then the opponent (``FIGHTER_FEATURES`` each), then the nearest incoming
+projectiles relative to the agent (``PROJECTILE_FEATURES`` each, zero padded).
+
+Requires ``gymnasium`` (``pip install gymnasium``).
+"""
+import random
+
+import gymnasium as gym
+import numpy as np
+from gymnasium import spaces
+from gymnasium.vector import AutoresetMode, VectorEnv
+from gymnasium.vector.utils import batch_space
+
+import app
+from tournament import DEFAULT_MAX_TICKS, POLICIES
+
+# Ability cooldowns observed per fighter; the input mask has room for three
+ABILITY_SLOTS = 3
+FIGHTER_FEATURES = 12 + ABILITY_SLOTS
+PROJECTILE_FEATURES = 5
+NEAREST_PROJECTILES = 4
+OBSERVATION_SIZE = 2 * FIGHTER_FEATURES + NEAREST_PROJECTILES * PROJECTILE_FEATURES
+ACTIONS = 256
+
+# Reward for winning (and penalty for losing) on top of per-tick health swings
+WIN_REWARD = 1.0
+
+
+def observe_fighter(player, out):
+    table = player.abilities
+    # Each cooldown runs from its full length down to 0; Fight checks the kit fits the slots
+    cooldowns = [cooldown / (length or 1) for cooldown, length in zip(player.ability_cooldowns, table.cooldowns)]
+    cooldowns += [0.0] * (ABILITY_SLOTS - len(cooldowns))
+    # One assignment instead of a numpy item write per feature
+    out[:] = (
+        player.x / app.SCREEN_WIDTH,
+        player.y / app.SCREEN_HEIGHT,
+        player.vel_x / 10,
+        player.vel_y / 15,
+        player.health / player.max_health,
+        player.direction,
+        player.on_ground,
+        player.hit_cooldown / 20,
+        *cooldowns,
+        player.hypercharge_ready,
+        player.hypercharge_active,
+        player.hypercharge_duration / (table.duration or 1),
+        player.hypercharge_cooldown / (table.cooldown or 1),
+    )
+
+
+def observe(me, opponent, out):
+    """Fill ``out`` with the observation of the fight as seen by ``me``."""
+    out[:] = 0
+    observe_fighter(me, out[:FIGHTER_FEATURES])
+    observe_fighter(opponent, out[FIGHTER_FEATURES:2 * FIGHTER_FEATURES])
+
+    cx = me.x + me.width / 2
+    cy = me.y + me.height / 2
+    incoming = [(p.x - cx, p.y - cy, p) for p in opponent.projectiles if p.active]
+    if len(incoming) > NEAREST_PROJECTILES:
+        incoming.sort(key=lambda item: item[0] * item[0] + item[1] * item[1])
+    offset = 2 * FIGHTER_FEATURES
+    for dx, dy, projectile in incoming[:NEAREST_PROJECTILES]:
+        vx, vy = projectile.velocity()
+        out[offset:offset + PROJECTILE_FEATURES] = (
+            dx / app.SCREEN_WIDTH, dy / app.SCREEN_HEIGHT, vx / 20, vy / 20, 1.0)
+        offset += PROJECTILE_FEATURES
+    return out
+
+
+def make_policy(opponent, seed):
+    """Return a ``policy(match, me, opponent) -> mask`` callable, or None for an idle opponent."""
+    if opponent is None:
+        return None
+    factory = POLICIES[opponent] if isinstance(opponent, str) else opponent
+    return factory(random.Random(seed))
+
+
+class Fight:
+    """One headless match seen from the agent's side, shared by both environments."""
+    def __init__(self, player=1, opponent="scripted", max_ticks=DEFAULT_MAX_TICKS):
+        if player not in (1, 2):
+            raise ValueError(f"player must be 1 or 2, got {player!r}")
+        self.player = player
+        self.opponent_policy = opponent
+        self.max_ticks = max_ticks
+        self.match = app.Match(0, visuals=False)
+        for fighter in self.match.players:
+            count = len(fighter.abilities.cooldowns)
+            if count > ABILITY_SLOTS:
+                raise ValueError(f"{fighter.name} has {count} abilities; observations have room for {ABILITY_SLOTS}")
+
+    def reset(self, seed):
+        match = self.match
+        match.seed = seed
+        match.reset()
+        if self.player == 1:
+            self.me, self.opponent = match.player1, match.player2
+        else:
+            self.me, self.opponent = match.player2, match.player1
+        self.policy = make_policy(self.opponent_policy, seed)
+
+    def step(self, action):
+        """Advance one tick and return (reward, terminated, truncated)."""
+        match = self.match
+        me = self.me
+        opponent = self.opponent
+        my_health = me.health
+        opponent_health = opponent.health
+
+        my_input = me.decode_input(int(action))
+        opponent_input = opponent.decode_input(self.policy(match, opponent, me)) if self.policy else app.NO_KEYS
+        if self.player == 1:
+            match.step(my_input, opponent_input)
+        else:
+            match.step(opponent_input, my_input)
+
+        reward = ((opponent_health - opponent.health) - (my_health - me.health)) / me.max_health
+        if match.game_over:
+            reward += WIN_REWARD if match.winner == me.name else -WIN_REWARD
+        return reward, match.game_over, not match.game_over and match.tick >= self.max_ticks
+
+    def info(self):
+        return {'tick': self.match.tick, 'winner': self.match.winner}
+
+
+def observation_space():
+    return spaces.Box(-np.inf, np.inf, (OBSERVATION_SIZE,), np.float32)
+
+
+class SheepyEnv(gym.Env):
+    """Single match environment; the agent plays ``player`` (1 Telesheepy, 2 Rocket Hair).
+
+    ``opponent`` names a policy from ``tournament.POLICIES``, or is a factory
+    taking a ``random.Random`` and returning a policy, or None to stand still.
+    """
+    metadata = {'render_modes': []}
+
+    def __init__(self, player=1, opponent="scripted", max_ticks=DEFAULT_MAX_TICKS):
+        self.fight = Fight(player, opponent, max_ticks)
+        self.observation_space = observation_space()
+        self.action_space = spaces.Discrete(ACTIONS)
+        self.obs = np.zeros(OBSERVATION_SIZE, np.float32)
+
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        self.fight.reset(int(self.np_random.integers(2 ** 63)))
+        return observe(self.fight.me, self.fight.opponent, self.obs).copy(), self.fight.info()
+
+    def step(self, action):
+        reward, terminated, truncated = self.fight.step(action)
+        obs = observe(self.fight.me, self.fight.opponent, self.obs).copy()
+        return obs, reward, terminated, truncated, self.fight.info()
+
+
+class SheepyVectorEnv(VectorEnv):
+    """``num_envs`` matches stepped in lockstep with batched numpy buffers.
+
+    Finished matches reset within the same step; their last observation is
+    in ``info['final_obs']``, masked by ``info['_final_obs']``.
+    """
+    metadata = {'render_modes': [], 'autoreset_mode': AutoresetMode.SAME_STEP}
+
+    def __init__(self, num_envs, player=1, opponent="scripted", max_ticks=DEFAULT_MAX_TICKS):
+        self.num_envs = num_envs
+        self.fights = [Fight(player, opponent, max_ticks) for _ in range(num_envs)]
+        self.single_observation_space = observation_space()
+        self.single_action_space = spaces.Discrete(ACTIONS)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+
+        # Reused between steps; step() returns copies of the observations
+        self.obs = np.zeros((num_envs, OBSERVATION_SIZE), np.float32)
+        self.rewards = np.zeros(num_envs, np.float64)
+        self.terminations = np.zeros(num_envs, np.bool_)
+        self.truncations = np.zeros(num_envs, np.bool_)
+        self.ticks = np.zeros(num_envs, np.uint32)
+
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        seeds = self.np_random.integers(2 ** 63, size=self.num_envs)
+        for i, fight in enumerate(self.fights):
+            fight.reset(int(seeds[i]))
+            observe(fight.me, fight.opponent, self.obs[i])
+            self.ticks[i] = 0
+        return self.obs.copy(), {'tick': self.ticks.copy()}
+
+    def step(self, actions):
+        obs = self.obs
+        rewards = self.rewards
+        terminations = self.terminations
+        truncations = self.truncations
+        final_obs = None
+        for i, fight in enumerate(self.fights):
+            rewards[i], terminations[i], truncations[i] = fight.step(actions[i])
+            observe(fight.me, fight.opponent, obs[i])
+            self.ticks[i] = fight.match.tick
+            if terminations[i] or truncations[i]:
+                if final_obs is None:
+                    final_obs = np.zeros_like(obs)
+                final_obs[i] = obs[i]
+                fight.reset(int(self.np_random.integers(2 ** 63)))
+                observe(fight.me, fight.opponent, obs[i])
+
+        info = {'tick': self.ticks.copy()}
+        if final_obs is not None:
+            info['final_obs'] = final_obs
+            info['_final_obs'] = terminations | truncations
+        return obs.copy(), rewards.copy(), terminations.copy(), truncations.copy(), info
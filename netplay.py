@@ -0,0 +1,383 @@
+"""Rollback netcode for two-player online matches.
+
+Each peer runs the whole Match locally. Every tick it simulates straight
+away with its own input and a prediction of the remote one (the remote
+player's last known input). When the real remote input arrives and differs
+from the prediction, the peer restores the snapshot taken before that tick
+and re-simulates up to the present. A peer stalls instead of running more
+than ``max_rollback`` ticks ahead of the inputs it has confirmed.
+
+Packets carry every local input the peer has not acknowledged yet, so lost
+or reordered packets are repaired by the next one that arrives. They also
+carry the state hash of the latest frame whose inputs are all confirmed, so
+each side can spot a desync::
+
+    header    u32 frames received from the peer, u32 checked frame,
+              u64 state hash at that frame, u32 first frame, u8 count
+    body      count input masks (see Character.encode_input)
+
+Transports only need ``send(packet)`` and ``receive() -> [packet, ...]``;
+``LoopbackTransport`` links two sessions in one process, ``UdpTransport``
+talks over a socket, and ``LaggyTransport`` wraps either with artificial
+latency, jitter and loss. Try it headless with two bots::
+
+    python netplay.py --ticks 3600 --latency 0.1 --jitter 0.03 --loss 0.05
+    python netplay.py --udp --latency 0.05
+"""
+import argparse
+import heapq
+import random
+import socket
+import struct
+import time
+
+import app
+from bot import RuleBot
+
+PACKET = struct.Struct("<IIQIB")
+# Checked frame sent before any frame has been hashed
+NO_FRAME = 0xFFFFFFFF
+MAX_INPUTS_PER_PACKET = 255
+
+DEFAULT_MAX_ROLLBACK = 8
+DEFAULT_INPUT_DELAY = 2
+# State hashes kept for comparing with the peer's, in frames
+HASH_HISTORY = 240
+
+
+class LoopbackTransport:
+    """One end of an in-process link; ``pair()`` makes two connected ends."""
+    def __init__(self):
+        self.inbox = []
+        self.peer = None
+
+    @classmethod
+    def pair(cls):
+        a, b = cls(), cls()
+        a.peer, b.peer = b, a
+        return a, b
+
+    def send(self, packet):
+        self.peer.inbox.append(bytes(packet))
+
+    def receive(self):
+        packets = self.inbox
+        self.inbox = []
+        return packets
+
+
+class UdpTransport:
+    """Non-blocking UDP socket exchanging packets with one peer address."""
+    def __init__(self, port, peer, host="0.0.0.0"):
+        self.peer = (socket.gethostbyname(peer[0]), peer[1])
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+
+    def send(self, packet):
+        try:
+            self.sock.sendto(packet, self.peer)
+        except OSError:
+            # The peer is not listening yet; the next packet repeats this one
+            pass
+
+    def receive(self):
+        packets = []
+        while True:
+            try:
+                packet, address = self.sock.recvfrom(2048)
+            except (BlockingIOError, ConnectionResetError):
+                return packets
+            if address == self.peer:
+                packets.append(packet)
+
+    def close(self):
+        self.sock.close()
+
+
+class LaggyTransport:
+    """Delays, jitters and drops the packets sent through another transport.
+
+    Held packets go out from ``receive()``, which sessions call every tick.
+    """
+    def __init__(self, transport, latency=0.0, jitter=0.0, loss=0.0, rng=None, clock=time.perf_counter):
+        self.transport = transport
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.rng = rng if rng is not None else random.Random()
+        self.clock = clock
+        self.queue = []
+        self.sent = 0
+
+    def send(self, packet):
+        if self.rng.random() < self.loss:
+            return
+        deliver_at = self.clock() + self.latency + self.rng.uniform(0, self.jitter)
+        heapq.heappush(self.queue, (deliver_at, self.sent, bytes(packet)))
+        self.sent += 1
+
+    def receive(self):
+        now = self.clock()
+        queue = self.queue
+        while queue and queue[0][0] <= now:
+            self.transport.send(heapq.heappop(queue)[2])
+        return self.transport.receive()
+
+
+class RollbackSession:
+    """Drives ``match`` for the local ``player`` (1 or 2) against a remote peer.
+
+    Both peers must start from the same seed. Call ``advance`` once per tick
+    with the local input mask; it returns False while stalled waiting for the
+    remote player. ``confirmed_inputs`` collects the (player 1, player 2)
+    mask pairs both sides agree on, in the same layout as ``Replay.inputs``.
+    ``desync_frame`` is set to the first frame whose state hash differed
+    from the peer's.
+    """
+    def __init__(self, match, player, transport, max_rollback=DEFAULT_MAX_ROLLBACK,
+                 input_delay=DEFAULT_INPUT_DELAY):
+        if player not in (1, 2):
+            raise ValueError(f"player must be 1 or 2, got {player!r}")
+        if match.tick != 0:
+            raise ValueError("a session must start from a fresh match")
+        self.match = match
+        self.player = player
+        self.transport = transport
+        self.max_rollback = max_rollback
+        self.input_delay = input_delay
+
+        # Neither side has input for the first input_delay frames; both use 0
+        self.local_inputs = dict.fromkeys(range(input_delay), 0)
+        self.remote_inputs = dict.fromkeys(range(input_delay), 0)
+        self.confirmed_frame = input_delay - 1
+        self.predicted = {}
+        self.states = {}
+        self.rollback_from = None
+        self.remote_ack = 0
+        self.confirmed_inputs = bytearray()
+        self.confirm(range(input_delay))
+        self.hashes = {}
+        self.remote_hashes = {}
+        self.checked_frame = -1
+        self.desync_frame = None
+
+        self.rollbacks = 0
+        self.resimulated = 0
+        self.stalls = 0
+
+    @property
+    def frame(self):
+        return self.match.tick
+
+    def confirm(self, frames):
+        for frame in frames:
+            local = self.local_inputs[frame]
+            remote = self.remote_inputs[frame]
+            self.confirmed_inputs += bytes((local, remote) if self.player == 1 else (remote, local))
+
+    def poll(self):
+        """Take in the remote inputs that have arrived, noting any misprediction."""
+        for packet in self.transport.receive():
+            if len(packet) < PACKET.size:
+                continue
+            ack, checked, state_hash, start, count = PACKET.unpack_from(packet)
+            self.remote_ack = max(self.remote_ack, ack)
+            if checked != NO_FRAME:
+                self.remote_hashes[checked] = state_hash
+            for frame, mask in enumerate(packet[PACKET.size:PACKET.size + count], start):
+                if frame <= self.confirmed_frame or frame in self.remote_inputs:
+                    continue
+                self.remote_inputs[frame] = mask
+                predicted = self.predicted.pop(frame, None)
+                if predicted is not None and predicted != mask:
+                    if self.rollback_from is None or frame < self.rollback_from:
+                        self.rollback_from = frame
+
+        first = self.confirmed_frame + 1
+        # Only frames whose local input is also known can be confirmed
+        horizon = self.frame + self.input_delay
+        while self.confirmed_frame + 1 in self.remote_inputs and self.confirmed_frame + 1 < horizon:
+            self.confirmed_frame += 1
+        self.confirm(range(first, self.confirmed_frame + 1))
+
+    def remote_input(self, frame):
+        mask = self.remote_inputs.get(frame)
+        if mask is None:
+            # Predict that the remote player is still holding the same keys
+            mask = self.remote_inputs[self.confirmed_frame]
+            self.predicted[frame] = mask
+        return mask
+
+    def simulate(self, frame):
+        self.states[frame] = self.match.snapshot()
+        local = self.match.player1 if self.player == 1 else self.match.player2
+        remote = self.match.player2 if self.player == 1 else self.match.player1
+        local_keys = local.decode_input(self.local_inputs[frame])
+        remote_keys = remote.decode_input(self.remote_input(frame))
+        if self.player == 1:
+            self.match.step(local_keys, remote_keys)
+        else:
+            self.match.step(remote_keys, local_keys)
+
+    def rollback(self):
+        """Re-simulate from the earliest mispredicted frame to the present."""
+        start = self.rollback_from
+        self.rollback_from = None
+        end = self.frame
+        if start is None or start >= end:
+            return
+        self.match.restore(self.states[start])
+        for frame in range(start, end):
+            self.predicted.pop(frame, None)
+            self.simulate(frame)
+        self.rollbacks += 1
+        self.resimulated += end - start
+
+    def check(self):
+        """Hash the latest frame no rollback can change and compare it with the peer's."""
+        frame = min(self.confirmed_frame + 1, self.frame)
+        if frame > self.checked_frame:
+            snapshot = self.states.get(frame) if frame < self.frame else None
+            self.hashes[frame] = self.match.state_hash(snapshot)
+            self.checked_frame = frame
+            for old in [f for f in self.hashes if f < frame - HASH_HISTORY]:
+                del self.hashes[old]
+
+        for frame in [f for f in self.remote_hashes if f <= self.checked_frame]:
+            remote_hash = self.remote_hashes.pop(frame)
+            local_hash = self.hashes.get(frame)
+            if local_hash is not None and local_hash != remote_hash and self.desync_frame is None:
+                self.desync_frame = frame
+
+    def send(self):
+        frames_received = self.confirmed_frame + 1
+        checked = self.checked_frame if self.checked_frame >= 0 else NO_FRAME
+        state_hash = self.hashes.get(self.checked_frame, 0)
+        start = self.remote_ack
+        count = min(self.frame + self.input_delay - start, MAX_INPUTS_PER_PACKET)
+        masks = bytes(self.local_inputs[frame] for frame in range(start, start + count))
+        self.transport.send(PACKET.pack(frames_received, checked, state_hash, start, count) + masks)
+
+    def advance(self, local_mask):
+        """Run one tick with the local input; returns False if stalled on the remote peer."""
+        self.poll()
+        self.rollback()
+        frame = self.frame
+        if self.match.game_over:
+            # Keep the peer up to date in case a late input undoes the ending
+            self.check()
+            self.send()
+            return False
+        if frame - self.confirmed_frame > self.max_rollback:
+            self.stalls += 1
+            self.check()
+            self.send()
+            return False
+
+        self.local_inputs[frame + self.input_delay] = local_mask
+        self.simulate(frame)
+        self.check()
+        self.send()
+
+        # Nothing confirmed, simulated and acknowledged is needed again
+        for old in [f for f in self.states if f <= self.confirmed_frame]:
+            del self.states[old]
+        done = min(self.remote_ack, self.confirmed_frame + 1, self.frame)
+        for old in [f for f in self.local_inputs if f < done]:
+            del self.local_inputs[old]
+        for old in [f for f in self.remote_inputs if f < self.confirmed_frame]:
+            del self.remote_inputs[old]
+        return True
+
+    def settle(self):
+        """Apply any inputs that have arrived without advancing, e.g. after the last tick."""
+        self.poll()
+        self.rollback()
+        self.check()
+        self.send()
+
+
+def play(ticks, seed=0, latency=0.0, jitter=0.0, loss=0.0, udp=False, port=7000,
+         max_rollback=DEFAULT_MAX_ROLLBACK, input_delay=DEFAULT_INPUT_DELAY):
+    """Play two bots against each other through a lossy link and check both peers agree.
+
+    Runs on a simulated 60 Hz clock, so latency is measured in game time.
+    Returns the two sessions.
+    """
+    now = [0.0]
+
+    def clock():
+        return now[0]
+
+    if udp:
+        ends = (UdpTransport(port, ("127.0.0.1", port + 1)), UdpTransport(port + 1, ("127.0.0.1", port)))
+    else:
+        ends = LoopbackTransport.pair()
+    sessions = []
+    for player, end in enumerate(ends, 1):
+        transport = LaggyTransport(end, latency, jitter, loss, random.Random(seed * 2 + player), clock)
+        sessions.append(RollbackSession(app.Match(seed, visuals=False), player, transport,
+                                        max_rollback, input_delay))
+    bots = [RuleBot(random.Random(seed * 2 + player)) for player in (1, 2)]
+
+    for _ in range(ticks):
+        for session, bot in zip(sessions, bots):
+            match = session.match
+            me, opponent = (match.player1, match.player2) if session.player == 1 else (match.player2, match.player1)
+            session.advance(bot(match, me, opponent))
+        now[0] += 1 / app.TICK_RATE
+        if udp:
+            # Let the kernel hand over this tick's datagrams
+            time.sleep(0.0005)
+
+    # Drain the link so both peers confirm every frame they simulated
+    for _ in range(int((latency + jitter) * app.TICK_RATE) + 30):
+        now[0] += 1 / app.TICK_RATE
+        for session in sessions:
+            session.settle()
+        if udp:
+            time.sleep(0.001)
+    if udp:
+        for end in ends:
+            end.close()
+    return sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run two bots over a simulated network with rollback netcode.")
+    parser.add_argument("--ticks", type=int, default=3600)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.1, help="one-way latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay in seconds")
+    parser.add_argument("--loss", type=float, default=0.0, help="fraction of packets dropped")
+    parser.add_argument("--udp", action="store_true", help="send through UDP on localhost instead of in-process")
+    parser.add_argument("--port", type=int, default=7000, help="first of the two UDP ports")
+    parser.add_argument("--max-rollback", type=int, default=DEFAULT_MAX_ROLLBACK)
+    parser.add_argument("--input-delay", type=int, default=DEFAULT_INPUT_DELAY)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    sessions = play(args.ticks, args.seed, args.latency, args.jitter, args.loss, args.udp, args.port,
+                    args.max_rollback, args.input_delay)
+    elapsed = time.perf_counter() - start
+
+    # Replaying the agreed inputs from scratch must land on each peer's state
+    for session in sessions:
+        ticks = session.frame
+        reference = app.Match(args.seed, visuals=False)
+        for tick in range(ticks):
+            p1_mask, p2_mask = session.confirmed_inputs[tick * 2:tick * 2 + 2]
+            reference.step(reference.player1.decode_input(p1_mask), reference.player2.decode_input(p2_mask))
+        in_sync = (len(session.confirmed_inputs) >= ticks * 2 and session.desync_frame is None
+                   and reference.state_hash() == session.match.state_hash())
+        print(f"player {session.player}: tick {session.frame}, {session.rollbacks} rollbacks "
+              f"({session.resimulated} ticks resimulated), {session.stalls} stalls, "
+              f"{'in sync' if in_sync else 'DESYNC'}, state hash {session.match.state_hash():016x}")
+    agreed = min(len(session.confirmed_inputs) for session in sessions)
+    same = sessions[0].confirmed_inputs[:agreed] == sessions[1].confirmed_inputs[:agreed]
+    print(f"inputs {'agree' if same else 'DIFFER'} over {agreed // 2} ticks; {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
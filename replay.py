@@ -0,0 +1,183 @@
+"""Compact binary match replays.
+
+A replay stores the match seed and one byte of input per player per tick
+(see ``Character.encode_input``), plus full-state keyframes every few
+seconds so playback can jump to any tick without simulating from the start.
+
+File layout (little endian)::
+
+    header    magic b"SHRP", u16 version, u64 seed, u32 ticks,
+              u32 keyframe interval, u32 keyframe count
+    body      zlib stream of:
+                ticks * 2 bytes of input masks (player 1, player 2)
+                per keyframe: u32 tick, u32 length, snapshot bytes
+"""
+import argparse
+import bisect
+import struct
+import time
+import zlib
+
+import app
+
+MAGIC = b"SHRP"
+VERSION = 3
+HEADER = struct.Struct("<4sHQIII")
+KEYFRAME = struct.Struct("<II")
+
+# 5 seconds of play at 60 ticks per second
+DEFAULT_KEYFRAME_INTERVAL = 300
+
+
+class ReplayError(Exception):
+    pass
+
+
+class Replay:
+    """Seed, per-tick input masks and keyframes for one recorded match."""
+    def __init__(self, seed, inputs=b"", keyframes=None, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+        self.seed = seed
+        self.inputs = bytearray(inputs)
+        self.keyframes = dict(keyframes or {})
+        self.keyframe_interval = keyframe_interval
+
+    @property
+    def ticks(self):
+        return len(self.inputs) // 2
+
+    def input_at(self, tick):
+        """Return the (player 1, player 2) masks consumed by tick ``tick + 1``."""
+        return self.inputs[tick * 2], self.inputs[tick * 2 + 1]
+
+    def to_bytes(self):
+        body = bytearray(self.inputs)
+        for tick in sorted(self.keyframes):
+            snapshot = self.keyframes[tick]
+            body += KEYFRAME.pack(tick, len(snapshot))
+            body += snapshot
+        header = HEADER.pack(MAGIC, VERSION, self.seed, self.ticks,
+                             self.keyframe_interval, len(self.keyframes))
+        return header + zlib.compress(bytes(body), 9)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < HEADER.size:
+            raise ReplayError("replay file is truncated")
+        magic, version, seed, ticks, interval, keyframe_count = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ReplayError("not a replay file")
+        if version != VERSION:
+            raise ReplayError(f"unsupported replay version {version}")
+
+        body = zlib.decompress(data[HEADER.size:])
+        inputs = body[:ticks * 2]
+        keyframes = {}
+        offset = ticks * 2
+        for _ in range(keyframe_count):
+            tick, length = KEYFRAME.unpack_from(body, offset)
+            offset += KEYFRAME.size
+            keyframes[tick] = body[offset:offset + length]
+            offset += length
+        return cls(seed, inputs, keyframes, interval)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+class ReplayRecorder:
+    """Steps a fresh Match while logging its inputs and periodic keyframes."""
+    def __init__(self, match, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+        if match.tick != 0:
+            raise ReplayError("recording must start from a fresh match")
+        self.match = match
+        self.replay = Replay(match.seed, keyframe_interval=keyframe_interval)
+
+    def step(self, p1_input, p2_input):
+        match = self.match
+        if match.game_over:
+            return
+        if match.tick and match.tick % self.replay.keyframe_interval == 0:
+            self.replay.keyframes[match.tick] = match.snapshot()
+
+        # Step from the decoded masks so the sim sees exactly what was logged
+        p1_mask = match.player1.encode_input(p1_input)
+        p2_mask = match.player2.encode_input(p2_input)
+        self.replay.inputs += bytes((p1_mask, p2_mask))
+        match.step(match.player1.decode_input(p1_mask), match.player2.decode_input(p2_mask))
+
+    def save(self, path):
+        self.replay.save(path)
+
+
+class Replayer:
+    """Plays a Replay back on its own headless Match."""
+    def __init__(self, replay, visuals=False):
+        self.replay = replay
+        self.match = app.Match(replay.seed, visuals=visuals)
+        self.keyframe_ticks = sorted(replay.keyframes)
+
+    @property
+    def finished(self):
+        return self.match.tick >= self.replay.ticks
+
+    def advance(self, ticks=1):
+        match = self.match
+        replay = self.replay
+        decode1 = match.player1.decode_input
+        decode2 = match.player2.decode_input
+        end = min(match.tick + ticks, replay.ticks)
+        while match.tick < end:
+            p1_mask, p2_mask = replay.input_at(match.tick)
+            match.step(decode1(p1_mask), decode2(p2_mask))
+
+    def seek(self, tick):
+        """Jump to ``tick`` by restoring the nearest earlier keyframe and simulating forward."""
+        tick = max(0, min(tick, self.replay.ticks))
+        i = bisect.bisect_right(self.keyframe_ticks, tick)
+        base = self.keyframe_ticks[i - 1] if i else 0
+
+        # Keep simulating if we are already between the keyframe and the target
+        if not base <= self.match.tick <= tick:
+            if base:
+                self.match.restore(self.replay.keyframes[base])
+            else:
+                self.match.reset()
+        self.advance(tick - self.match.tick)
+
+    def run(self):
+        self.advance(self.replay.ticks - self.match.tick)
+        return self.match
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play back a recorded match headless.")
+    parser.add_argument("path", help="replay file")
+    parser.add_argument("--seek", type=int, metavar="TICK", help="stop at this tick instead of the end")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.path)
+    replayer = Replayer(replay)
+    start = time.perf_counter()
+    if args.seek is not None:
+        replayer.seek(args.seek)
+    else:
+        replayer.run()
+    elapsed = time.perf_counter() - start
+
+    match = replayer.match
+    print(f"seed {replay.seed}, {replay.ticks} ticks, {len(replay.keyframes)} keyframes")
+    print(f"at tick {match.tick} in {elapsed * 1000:.1f} ms")
+    for player in (match.player1, match.player2):
+        print(f"  {player.name}: health {player.health:g}, x {player.x:.1f}, y {player.y:.1f}")
+    if match.game_over:
+        print(f"  winner: {match.winner}")
+
+
+if __name__ == "__main__":
+    main()
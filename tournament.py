@@ -0,0 +1,245 @@
+"""Parallel headless Telesheepy vs Rocket Hair tournaments for balance sweeps.
+
+Plays N matches across a process pool with scripted or random input and
+streams one row per match into a directory of column files (one ``.npy``
+per column, memory-mapped and filled in as results arrive)::
+
+    python tournament.py 5000 --out results --p1 scripted --p2 random
+    python tournament.py 2000 --set ROCKET_DAMAGE=15 --set HYPERCHARGE_COOLDOWN=1200
+
+Load the results with ``numpy.load("results/winner.npy")``.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+import app
+from bot import ABILITY_BITS, HYPERCHARGE, LEFT, RIGHT, UP, RuleBot
+
+# Two minutes at 60 ticks per second; unfinished matches count as draws
+DEFAULT_MAX_TICKS = 7200
+
+# app constants --set may override
+BALANCE_CONSTANTS = (
+    'LIGHTNING_DAMAGE', 'ENHANCED_LIGHTNING_DAMAGE', 'HYPERCHARGE_LIGHTNING_DAMAGE',
+    'ROCKET_DAMAGE', 'HOMING_DAMAGE',
+    'HYPERCHARGE_DURATION', 'HYPERCHARGE_COOLDOWN',
+    'PROJECTILE_CLASH',
+    'PICKUP_INTERVAL', 'PICKUP_LIFETIME', 'PICKUP_HEAL',
+)
+# Those counting ticks or acting as flags take whole numbers; damage and healing may be fractional
+INTEGER_CONSTANTS = ('HYPERCHARGE_DURATION', 'HYPERCHARGE_COOLDOWN', 'PROJECTILE_CLASH',
+                     'PICKUP_INTERVAL', 'PICKUP_LIFETIME')
+
+
+class RandomPolicy:
+    """Mashes keys: holds a random direction for a while and presses abilities at random."""
+    def __init__(self, rng):
+        self.rng = rng
+        self.move = 0
+
+    def __call__(self, match, me, opponent):
+        rng = self.rng
+        if rng.random() < 0.05:
+            self.move = rng.choice((0, LEFT, RIGHT))
+        mask = self.move
+        if rng.random() < 0.05:
+            mask |= UP
+        for bit in ABILITY_BITS:
+            if rng.random() < 0.1:
+                mask |= bit
+        return mask
+
+
+class ScriptedPolicy:
+    """Keeps to mid range facing the opponent, fires whatever is ready and hypercharges on sight."""
+    def __init__(self, rng, preferred_range=350):
+        self.rng = rng
+        self.preferred_range = preferred_range
+
+    def __call__(self, match, me, opponent):
+        mask = 0
+        dx = opponent.x - me.x
+        distance = abs(dx)
+        toward = RIGHT if dx > 0 else LEFT
+        away = LEFT if dx > 0 else RIGHT
+
+        if distance > self.preferred_range + 50:
+            mask |= toward
+        elif distance < self.preferred_range - 50:
+            mask |= away
+        elif (me.direction > 0) != (dx > 0):
+            # Turn to face the opponent before firing
+            mask |= toward
+
+        # Hop over anything about to hit us, whichever enemy fired it
+        for projectile in (p for enemy in match.enemies.enemies(me.team) for p in enemy.projectiles):
+            if abs(projectile.x - me.x) < 120 and abs(projectile.y - me.y) < 90:
+                mask |= UP
+                break
+
+        facing = (me.direction > 0) == (dx > 0)
+        if facing:
+            for bit in ABILITY_BITS[:3]:
+                if self.rng.random() < 0.5:
+                    mask |= bit
+        if me.hypercharge_ready and distance < 400:
+            mask |= HYPERCHARGE
+        return mask
+
+
+POLICIES = {
+    'random': RandomPolicy,
+    'scripted': ScriptedPolicy,
+    'bot': RuleBot,
+}
+
+
+def columns(p1_cls=app.Telesheepy, p2_cls=app.RocketHair):
+    """Return the (name, dtype) schema of the results table."""
+    schema = [
+        ('seed', np.uint64),
+        ('winner', np.int8),  # 0 draw, 1 player 1, 2 player 2
+        ('ticks', np.uint32),
+        ('p1_health', np.float32),
+        ('p2_health', np.float32),
+        ('p1_hypercharges', np.uint16),
+        ('p2_hypercharges', np.uint16),
+    ]
+    schema += [(f'p1_damage_{name}', np.float32) for name in p1_cls.ability_names]
+    schema += [(f'p2_damage_{name}', np.float32) for name in p2_cls.ability_names]
+    return schema
+
+
+def apply_overrides(overrides):
+    for name, value in overrides.items():
+        setattr(app, name, value)
+    # Ability tables copy the constants they name when compiled
+    app.load_abilities()
+
+
+def play_match(job):
+    """Play one headless match and return (index, row dict)."""
+    index, seed, p1_policy, p2_policy, max_ticks = job
+    match = app.Match(seed, visuals=False)
+    player1 = match.player1
+    player2 = match.player2
+    policy1 = POLICIES[p1_policy](random.Random(seed * 2 + 1))
+    policy2 = POLICIES[p2_policy](random.Random(seed * 2 + 2))
+    decode1 = player1.decode_input
+    decode2 = player2.decode_input
+
+    while not match.game_over and match.tick < max_ticks:
+        match.step(decode1(policy1(match, player1, player2)),
+                   decode2(policy2(match, player2, player1)))
+
+    if match.winner == player1.name:
+        winner = 1
+    elif match.winner == player2.name:
+        winner = 2
+    else:
+        winner = 0
+    row = {
+        'seed': seed,
+        'winner': winner,
+        'ticks': match.tick,
+        'p1_health': player1.health,
+        'p2_health': player2.health,
+        'p1_hypercharges': player1.hypercharge_uses,
+        'p2_hypercharges': player2.hypercharge_uses,
+    }
+    for name, damage in player1.damage_dealt.items():
+        row[f'p1_damage_{name}'] = damage
+    for name, damage in player2.damage_dealt.items():
+        row[f'p2_damage_{name}'] = damage
+    return index, row
+
+
+class ColumnWriter:
+    """Preallocated ``.npy`` column files in a directory, written row by row."""
+    def __init__(self, out_dir, rows, schema):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.columns = {
+            name: np.lib.format.open_memmap(os.path.join(out_dir, f'{name}.npy'), mode='w+',
+                                            dtype=dtype, shape=(rows,))
+            for name, dtype in schema
+        }
+
+    def write(self, index, row):
+        for name, column in self.columns.items():
+            column[index] = row[name]
+
+    def flush(self):
+        for column in self.columns.values():
+            column.flush()
+
+
+def parse_override(text):
+    name, sep, value = text.partition('=')
+    if not sep or name not in BALANCE_CONSTANTS:
+        raise argparse.ArgumentTypeError(
+            f"expected NAME=VALUE with NAME one of {', '.join(BALANCE_CONSTANTS)}, got {text!r}")
+    try:
+        number = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a number for {name}, got {value!r}")
+    if number.is_integer():
+        return name, int(number)
+    if name in INTEGER_CONSTANTS:
+        raise argparse.ArgumentTypeError(f"{name} takes a whole number, got {value!r}")
+    return name, number
+
+
+def run(matches, out_dir, p1_policy='scripted', p2_policy='scripted', seed=0,
+        max_ticks=DEFAULT_MAX_TICKS, overrides=None, processes=None, chunksize=16):
+    overrides = dict(overrides or {})
+    writer = ColumnWriter(out_dir, matches, columns())
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump({'matches': matches, 'p1_policy': p1_policy, 'p2_policy': p2_policy,
+                   'seed': seed, 'max_ticks': max_ticks, 'overrides': overrides}, f, indent=2)
+
+    jobs = ((i, seed + i, p1_policy, p2_policy, max_ticks) for i in range(matches))
+    wins = [0, 0, 0]
+    done = 0
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes, initializer=apply_overrides, initargs=(overrides,)) as pool:
+        for index, row in pool.imap_unordered(play_match, jobs, chunksize):
+            writer.write(index, row)
+            wins[row['winner']] += 1
+            done += 1
+            if done % 500 == 0:
+                writer.flush()
+                print(f"{done}/{matches} matches, {done / (time.perf_counter() - start):.0f}/s")
+    writer.flush()
+    return wins, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a headless Telesheepy vs Rocket Hair tournament.")
+    parser.add_argument('matches', type=int, help="number of matches to play")
+    parser.add_argument('--out', default='tournament_results', help="output directory for column files")
+    parser.add_argument('--p1', choices=sorted(POLICIES), default='scripted', help="Telesheepy policy")
+    parser.add_argument('--p2', choices=sorted(POLICIES), default='scripted', help="Rocket Hair policy")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first match")
+    parser.add_argument('--max-ticks', type=int, default=DEFAULT_MAX_TICKS)
+    parser.add_argument('--set', dest='overrides', type=parse_override, action='append', default=[],
+                        metavar='NAME=VALUE', help="override a balance constant, e.g. ROCKET_DAMAGE=15")
+    parser.add_argument('--processes', type=int, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    wins, elapsed = run(args.matches, args.out, args.p1, args.p2, args.seed, args.max_ticks,
+                        dict(args.overrides), args.processes)
+    total = max(1, args.matches)
+    print(f"{args.matches} matches in {elapsed:.1f} s")
+    print(f"  Telesheepy {wins[1] / total:.1%}, Rocket Hair {wins[2] / total:.1%}, draws {wins[0] / total:.1%}")
+    print(f"  results in {args.out}/")
+
+
+if __name__ == '__main__':
+    main()